@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+LATEST_FILE = 'LATEST'
+
+# Large arrays stored one per .npy so they can be opened with mmap_mode='r'
+MMAP_ARRAYS = ('content_scaled', 'svd_pu', 'svd_qi', 'svd_bu', 'svd_bi')
+
+
+def _id_array(ids):
+    # Fixed-width arrays (int or unicode) so no pickling is needed to load them
+    ids = list(ids)
+    if all(isinstance(i, (int, np.integer)) for i in ids):
+        return np.asarray(ids, dtype=np.int64)
+    return np.asarray([str(i) for i in ids])
+
+
+def _ids_by_inner(index):
+    ids = [None] * len(index)
+    for raw, inner in index.items():
+        ids[inner] = raw
+    return _id_array(ids)
+
+
+def build_artifacts(model, out_root='artifacts', version=None):
+    # Write the numeric state of a loaded SpotifyModel as a versioned bundle
+    version = version or datetime.now().strftime('%Y%m%dT%H%M%S')
+    out_dir = os.path.join(out_root, version)
+    os.makedirs(out_dir, exist_ok=False)
+
+    arrays = {'content_scaled': np.ascontiguousarray(model.data_content_scaled)}
+    scorer = model.svd_scorer
+    if scorer is not None:
+        arrays.update(svd_pu=scorer.pu, svd_qi=scorer.qi, svd_bu=scorer.bu, svd_bi=scorer.bi,
+                      svd_user_ids=_ids_by_inner(scorer.user_index),
+                      svd_item_ids=_ids_by_inner(scorer.item_index))
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array)
+
+    scaler = model.scaler
+    np.savez(os.path.join(out_dir, 'scaler.npz'), mean=scaler.mean_, scale=scaler.scale_,
+             var=scaler.var_, n_samples_seen=np.asarray(scaler.n_samples_seen_))
+
+    nn_model = model.nn_model_content
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'feature_columns': list(getattr(scaler, 'feature_names_in_', [])),
+        'content_index': {
+            'metric': nn_model.metric,
+            'p': getattr(nn_model, 'p', 2),
+            'algorithm': nn_model.algorithm,
+            'n_neighbors': nn_model.n_neighbors,
+        },
+        'svd': None if scorer is None else {
+            'global_mean': scorer.global_mean,
+            'rating_scale': list(scorer.rating_scale) if scorer.rating_scale else None,
+            'biased': bool(scorer.biased),
+            'params': model.svd_params,
+        },
+        'arrays': {name: {'shape': list(array.shape), 'dtype': str(array.dtype)}
+                   for name, array in arrays.items()},
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    write_latest(out_root, version)
+    logger.info(f"Wrote model artifacts {version} to {out_dir}")
+    return out_dir
+
+
+def resolve_artifact_dir(path, marker='manifest.json'):
+    # Accept a version directory (holding marker) or a root holding a LATEST pointer
+    if os.path.exists(os.path.join(path, marker)):
+        return path
+    latest = os.path.join(path, LATEST_FILE)
+    if os.path.exists(latest):
+        with open(latest) as file:
+            return os.path.join(path, file.read().strip())
+    raise FileNotFoundError(f"No model artifacts found in {path}")
+
+
+def write_latest(root, version):
+    # Point LATEST at a version directory atomically
+    latest_tmp = os.path.join(root, LATEST_FILE + '.tmp')
+    with open(latest_tmp, 'w') as file:
+        file.write(version)
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+
+
+def load_artifacts(path):
+    # Returns (manifest, arrays, load_times); large arrays are read-only memory maps
+    artifact_dir = resolve_artifact_dir(path)
+    with open(os.path.join(artifact_dir, 'manifest.json')) as file:
+        manifest = json.load(file)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise RuntimeError(f"Unsupported artifact format {manifest.get('format')} in {artifact_dir}")
+
+    arrays = {}
+    load_times = {}
+    for name in manifest['arrays']:
+        start = time.perf_counter()
+        mmap_mode = 'r' if name in MMAP_ARRAYS else None
+        arrays[name] = np.load(os.path.join(artifact_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+        load_times[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with np.load(os.path.join(artifact_dir, 'scaler.npz')) as scaler:
+        arrays['scaler'] = {key: scaler[key] for key in scaler.files}
+    load_times['scaler'] = time.perf_counter() - start
+    return manifest, arrays, load_times
+
+
+if __name__ == '__main__':
+    import argparse
+    from spotify_model import SpotifyModel
+
+    parser = argparse.ArgumentParser(description="Build a versioned model artifact bundle")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--out', default='artifacts')
+    parser.add_argument('--version', default=None)
+    parser.add_argument('--model-dir', default=None, help="trained pickles (python train.py)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_artifacts(SpotifyModel(model_dir=args.model_dir), out_root=args.out, version=args.version)
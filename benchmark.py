@@ -0,0 +1,208 @@
+import os
+import sys
+import glob
+import json
+import time
+import pickle
+import string
+import logging
+import platform
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from cache import SpotifyCache
+from fakes import FakeSpotifyClient, working_dir
+from recommender import Recommender
+from spotify_model import FEATURE_COLS, SpotifyModel
+
+logger = logging.getLogger(__name__)
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+GENRES = ['acoustic', 'chill', 'dance', 'edm', 'jazz', 'metal', 'pop', 'rock']
+ID_ALPHABET = np.array(list(string.ascii_letters + string.digits))
+
+
+def _track_ids(rng, n):
+    return [''.join(chars) for chars in ID_ALPHABET[rng.integers(0, len(ID_ALPHABET), (n, 22))]]
+
+
+def generate_dataset(path, n_tracks, n_users=1000, ratings_per_user=100, off_catalog=0.02, seed=0):
+    # Catalog, user matrix and both model pickles laid out as SpotifyModel expects
+    if os.path.exists(os.path.join(path, 'svd_model.pkl')):
+        return
+    from surprise import SVD, Dataset, Reader
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(path, 'data'), exist_ok=True)
+    track_ids = _track_ids(rng, n_tracks)
+    catalog = pd.DataFrame({
+        'track_id': track_ids,
+        'artists': [f"Artist {i % 5000}" for i in range(n_tracks)],
+        'track_name': [f"Track {i}" for i in range(n_tracks)],
+        'track_genre': rng.choice(GENRES, n_tracks),
+        'popularity': rng.random(n_tracks),
+        **{col: rng.random(n_tracks) for col in FEATURE_COLS if col not in ('popularity', 'tempo')},
+        'tempo': 60 + 140 * rng.random(n_tracks),
+    })
+    catalog.to_csv(os.path.join(path, 'data', 'data_cleaned.csv'), index=False)
+
+    # A few rated tracks exist only in the user matrix, as in the real data
+    n_ratings = n_users * ratings_per_user
+    rated = np.asarray(track_ids, dtype=object)[rng.integers(0, n_tracks, n_ratings)]
+    extra = rng.random(n_ratings) < off_catalog
+    rated[extra] = _track_ids(rng, int(extra.sum()))
+    ratings = pd.DataFrame({
+        'user_id': np.repeat(np.arange(1, n_users + 1), ratings_per_user),
+        'track_id': rated,
+        'rating': rng.random(n_ratings),
+    }).drop_duplicates(['user_id', 'track_id'])
+    ratings.to_csv(os.path.join(path, 'data', 'user_matrix.csv'), index=False)
+
+    scaled = StandardScaler().fit_transform(catalog[FEATURE_COLS])
+    nn_model = NearestNeighbors(n_neighbors=10, metric='cosine', algorithm='brute').fit(scaled)
+    data = Dataset.load_from_df(ratings, Reader(rating_scale=(0, 1)))
+    svd = SVD(n_factors=50, n_epochs=10, random_state=seed).fit(data.build_full_trainset())
+    for name, model in (('nn_model.pkl', nn_model), ('svd_model.pkl', svd)):
+        with open(os.path.join(path, name), 'wb') as file:
+            pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def summarize(seconds):
+    seconds = np.asarray(seconds)
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+    return {'n': len(seconds), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+            'mean_ms': seconds.mean() * 1000, 'qps': len(seconds) / seconds.sum()}
+
+
+def measure(call, args, warmup=5):
+    for arg in args[:warmup]:
+        call(*arg)
+    seconds = []
+    for arg in args:
+        start = time.perf_counter()
+        call(*arg)
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+
+def bench_size(path, n_queries=200, top_n=10, cold_starts=3, off_catalog_seeds=0.1, seed=1, **model_params):
+    rng = np.random.default_rng(seed)
+    with working_dir(path):
+        cold = []
+        for _ in range(cold_starts):
+            start = time.perf_counter()
+            model = SpotifyModel(**model_params)
+            cold.append(time.perf_counter() - start)
+        results = {'cold_start': summarize(cold)}
+
+        # Start from an empty track cache so runs are comparable
+        for cache_file in glob.glob(os.path.join(path, 'bench_cache.db*')):
+            os.remove(cache_file)
+        cache = SpotifyCache(cache_file=os.path.join(path, 'bench_cache.db'), memory_size=4096)
+        recommender = Recommender(model, FakeSpotifyClient(), cache)
+        catalog_ids = recommender.track_ids
+        seeds = [catalog_ids[i] for i in rng.integers(0, len(catalog_ids), n_queries)]
+        # Off-catalog seeds go through the fetch path (first call) and the cache
+        for i in np.flatnonzero(rng.random(n_queries) < off_catalog_seeds):
+            seeds[i] = _track_ids(rng, 1)[0]
+        users = rng.integers(1, model.user_items.user_ids.max() + 1, n_queries).tolist()
+
+        results['content'] = measure(recommender.get_content_based_recommendations,
+                                     [(tid, top_n) for tid in seeds])
+        results['collaborative'] = measure(recommender.get_collaborative_recommendations,
+                                           [(user, top_n) for user in users])
+        results['hybrid'] = measure(recommender.get_hybrid_recommendations,
+                                    [(user, tid, top_n) for user, tid in zip(users, seeds)])
+        cache.close()
+    results['dataset'] = {'tracks': len(model.data_cleaned), 'ratings': len(model.new_df),
+                          'users': len(model.user_items.user_ids)}
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(current, baseline):
+    # Rows of (size, operation, metric, baseline, current, relative change)
+    rows = []
+    for size, operations in current['results'].items():
+        for operation, stats in operations.items():
+            old = baseline.get('results', {}).get(size, {}).get(operation)
+            if old is None or operation == 'dataset':
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'qps'):
+                change = (stats[metric] - old[metric]) / old[metric] if old[metric] else None
+                rows.append((size, operation, metric, old[metric], stats[metric], change))
+    return rows
+
+
+def print_results(report):
+    print(f"{'size':<6}{'operation':<15}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'qps':>10}")
+    for size, operations in report['results'].items():
+        for operation, stats in operations.items():
+            if operation == 'dataset':
+                continue
+            print(f"{size:<6}{operation:<15}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['qps']:>10.1f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recommender latency and throughput benchmark")
+    parser.add_argument('--sizes', default='10k,100k,1m', help=f"comma separated, from {', '.join(SIZES)}")
+    parser.add_argument('--work-dir', default='bench_data', help="generated datasets are reused from here")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--cold-starts', type=int, default=3)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--ratings-per-user', type=int, default=100)
+    parser.add_argument('--content-backend', default='exact')
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--out', default=None, help="write results as JSON")
+    parser.add_argument('--compare', default=None, help="baseline JSON from an earlier run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    work_dir = os.path.abspath(args.work_dir)
+    report = {'environment': environment(), 'params': vars(args), 'results': {}}
+    for size in args.sizes.split(','):
+        path = os.path.join(work_dir, f"{size}-u{args.users}-r{args.ratings_per_user}")
+        start = time.perf_counter()
+        generate_dataset(path, SIZES[size], n_users=args.users, ratings_per_user=args.ratings_per_user)
+        print(f"{size}: dataset ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        report['results'][size] = bench_size(path, n_queries=args.queries, top_n=args.top_n,
+                                             cold_starts=args.cold_starts,
+                                             content_backend=args.content_backend, compact=args.compact)
+
+    print_results(report)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"\nagainst {baseline['environment'].get('commit')}")
+        print(f"{'size':<6}{'operation':<15}{'metric':<8}{'baseline':>10}{'current':>10}{'change':>9}")
+        for size, operation, metric, old, new, change in compare(report, baseline):
+            change = '-' if change is None else f"{change:+.1%}"
+            print(f"{size:<6}{operation:<15}{metric:<8}{old:>10.2f}{new:>10.2f}{change:>9}")
@@ -20,34 +20,333 @@
 #         except Exception as e:
 #             logger.error(f"Cache set error: {str(e)}")
 
+import json
 import shelve
+import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
+from cachetools import TTLCache
+from metrics import NULL_METRICS
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class _MemoryTier(TTLCache):
+    # TTLCache only calls popitem() to make room, so this counts LRU evictions
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
 class SpotifyCache:
-    def __init__(self, cache_file='spotify_cache.db'):
+    def __init__(self, cache_file='spotify_cache.db', ttl=timedelta(days=30),
+                 memory_size=1024, memory_ttl=3600, metrics=None):
         self.cache_file = cache_file
-        
+        self.ttl = ttl
+        self.metrics = metrics or NULL_METRICS
+        self._lock = threading.RLock()
+        self._memory = _MemoryTier(memory_size, memory_ttl) if memory_size > 0 else None
+        self._disk = None
+        self._counts = {
+            'memory': {'hits': 0, 'misses': 0},
+            'disk': {'hits': 0, 'misses': 0, 'evictions': 0},
+        }
+
+    def _open(self):
+        # One long-lived handle instead of an open/close per call
+        if self._disk is None:
+            self._disk = shelve.open(self.cache_file)
+        return self._disk
+
+    def _fresh(self, entry):
+        return datetime.now() - entry['timestamp'] < self.ttl
+
+    def _record(self, tier, result):
+        if result != 'stale':
+            self._counts[tier]['hits' if result == 'hit' else 'misses'] += 1
+        self.metrics.increment('cache_requests', tier=tier, result=result)
+
     def get(self, track_id):
+        with self._lock:
+            if self._memory is not None:
+                entry = self._memory.get(track_id)
+                if entry is not None and self._fresh(entry):
+                    self._record('memory', 'hit')
+                    return entry['track_data']
+                self._record('memory', 'miss')
+
+            try:
+                with self.metrics.timer('cache_io_seconds', backend='shelve', op='read'):
+                    cache = self._open()
+                    entry = cache.get(track_id)
+                if entry is not None and self._fresh(entry):
+                    self._record('disk', 'hit')
+                    if self._memory is not None:
+                        self._memory[track_id] = entry
+                    return entry['track_data']
+            except Exception as e:
+                logger.warning(f"Cache read error: {e}")
+            self._record('disk', 'miss')
+        return None
+
+    def set(self, track_id, track_data):
+        entry = {
+            'track_data': track_data,
+            'timestamp': datetime.now()
+        }
+        with self._lock:
+            # Write-through: memory first, then the disk store
+            if self._memory is not None:
+                self._memory[track_id] = entry
+            try:
+                with self.metrics.timer('cache_io_seconds', backend='shelve', op='write'):
+                    cache = self._open()
+                    cache[track_id] = entry
+                    cache.sync()
+            except Exception as e:
+                logger.warning(f"Cache write error: {e}")
+
+    def peek(self, track_id):
+        # (track_data, fresh) even for expired entries, or None; counted in
+        # metrics (stale entries as 'stale') but not in stats
+        with self._lock:
+            tier = 'memory'
+            entry = self._memory.get(track_id) if self._memory is not None else None
+            if entry is None:
+                if self._memory is not None:
+                    self.metrics.increment('cache_requests', tier='memory', result='miss')
+                tier = 'disk'
+                try:
+                    with self.metrics.timer('cache_io_seconds', backend='shelve', op='read'):
+                        cache = self._open()
+                        entry = cache.get(track_id)
+                except Exception as e:
+                    logger.warning(f"Cache read error: {e}")
+            if entry is None:
+                self.metrics.increment('cache_requests', tier=tier, result='miss')
+                return None
+            fresh = self._fresh(entry)
+            if fresh and tier == 'disk' and self._memory is not None:
+                # Promoted like get(), so repeat reads stay off the shelve
+                self._memory[track_id] = entry
+            self.metrics.increment('cache_requests', tier=tier, result='hit' if fresh else 'stale')
+            return entry['track_data'], fresh
+
+    def get_many(self, track_ids):
+        # Dict of the fresh entries among track_ids
+        found = {}
+        with self._lock:
+            for track_id in track_ids:
+                track_data = self.get(track_id)
+                if track_data is not None:
+                    found[track_id] = track_data
+        return found
+
+    def set_many(self, items):
+        now = datetime.now()
+        with self._lock:
+            try:
+                with self.metrics.timer('cache_io_seconds', backend='shelve', op='write'):
+                    cache = self._open()
+                    for track_id, track_data in items.items():
+                        entry = {'track_data': track_data, 'timestamp': now}
+                        if self._memory is not None:
+                            self._memory[track_id] = entry
+                        cache[track_id] = entry
+                    cache.sync()
+            except Exception as e:
+                logger.warning(f"Cache write error: {e}")
+
+    def purge_expired(self):
+        with self._lock:
+            try:
+                cache = self._open()
+                expired = [key for key in cache.keys() if not self._fresh(cache[key])]
+                for key in expired:
+                    del cache[key]
+                cache.sync()
+                self._counts['disk']['evictions'] += len(expired)
+                return len(expired)
+            except Exception as e:
+                logger.warning(f"Cache purge error: {e}")
+                return 0
+
+    def stats(self):
+        with self._lock:
+            stats = {tier: dict(counts) for tier, counts in self._counts.items()}
+            stats['memory']['evictions'] = self._memory.evictions if self._memory is not None else 0
+            stats['memory']['size'] = len(self._memory) if self._memory is not None else 0
+            return stats
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
+class SQLiteCache:
+    """Track cache in SQLite (WAL mode), safe to share between processes.
+
+    Same get/set interface as SpotifyCache plus transactional bulk
+    get_many/set_many; expiry is an indexed column so purge_expired is one
+    DELETE.
+    """
+
+    # Stay under SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+    _BATCH = 900
+
+    def __init__(self, db_file='spotify_cache.sqlite', ttl=timedelta(days=30), timeout=30, metrics=None):
+        self.db_file = db_file
+        self.ttl = ttl
+        self.timeout = timeout
+        self.metrics = metrics or NULL_METRICS
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counts = {'disk': {'hits': 0, 'misses': 0, 'evictions': 0}}
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tracks ("
+                "track_id TEXT PRIMARY KEY, "
+                "track_data TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tracks_expires_at ON tracks (expires_at)")
+
+    def _connect(self):
+        # sqlite3 connections are per thread; each process opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self._counts['disk']['hits'] += hits
+            self._counts['disk']['misses'] += misses
+        self.metrics.increment('cache_requests', hits, tier='disk', result='hit')
+        self.metrics.increment('cache_requests', misses, tier='disk', result='miss')
+
+    def get(self, track_id):
+        return self.get_many([track_id]).get(track_id)
+
+    def set(self, track_id, track_data):
+        self.set_many({track_id: track_data})
+
+    def peek(self, track_id):
+        # (track_data, fresh) even for expired rows, or None; not counted in stats
         try:
-            with shelve.open(self.cache_file) as cache:
-                if track_id in cache:
-                    data = cache[track_id]
-                    if datetime.now() - data['timestamp'] < timedelta(days=30):
-                        return data['track_data']
+            with self.metrics.timer('cache_io_seconds', backend='sqlite', op='read'):
+                row = self._connect().execute(
+                    "SELECT track_data, expires_at FROM tracks WHERE track_id = ?", (track_id,)
+                ).fetchone()
         except Exception as e:
             logger.warning(f"Cache read error: {e}")
-        return None
-        
-    def set(self, track_id, track_data):
+            return None
+        if row is None:
+            self.metrics.increment('cache_requests', tier='disk', result='miss')
+            return None
+        fresh = row[1] > time.time()
+        self.metrics.increment('cache_requests', tier='disk', result='hit' if fresh else 'stale')
+        return json.loads(row[0]), fresh
+
+    def get_many(self, track_ids):
+        track_ids = list(dict.fromkeys(track_ids))
+        found = {}
         try:
-            with shelve.open(self.cache_file) as cache:
-                cache[track_id] = {
-                    'track_data': track_data,
-                    'timestamp': datetime.now()
-                }
+            conn = self._connect()
+            now = time.time()
+            with conn, self.metrics.timer('cache_io_seconds', backend='sqlite', op='read'):
+                for start in range(0, len(track_ids), self._BATCH):
+                    batch = track_ids[start:start + self._BATCH]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = conn.execute(
+                        f"SELECT track_id, track_data FROM tracks "
+                        f"WHERE track_id IN ({placeholders}) AND expires_at > ?",
+                        (*batch, now)
+                    )
+                    for track_id, track_data in rows:
+                        found[track_id] = json.loads(track_data)
+        except Exception as e:
+            logger.warning(f"Cache read error: {e}")
+        self._count(len(found), len(track_ids) - len(found))
+        return found
+
+    def set_many(self, items):
+        now = time.time()
+        self._write([(track_id, track_data, now) for track_id, track_data in items.items()])
+
+    def _write(self, entries):
+        # entries are (track_id, track_data, updated_at); one transaction for all
+        ttl = self.ttl.total_seconds()
+        rows = [(track_id, json.dumps(track_data), updated_at, updated_at + ttl)
+                for track_id, track_data, updated_at in entries]
+        try:
+            conn = self._connect()
+            with conn, self.metrics.timer('cache_io_seconds', backend='sqlite', op='write'):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tracks (track_id, track_data, updated_at, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
         except Exception as e:
             logger.warning(f"Cache write error: {e}")
 
+    def purge_expired(self):
+        try:
+            conn = self._connect()
+            with conn:
+                deleted = conn.execute("DELETE FROM tracks WHERE expires_at <= ?", (time.time(),)).rowcount
+            with self._lock:
+                self._counts['disk']['evictions'] += deleted
+            return deleted
+        except Exception as e:
+            logger.warning(f"Cache purge error: {e}")
+            return 0
+
+    def migrate_from_shelve(self, shelve_file='spotify_cache.db'):
+        # One-shot import of an existing SpotifyCache shelve, keeping its timestamps
+        cutoff = time.time() - self.ttl.total_seconds()
+        entries = []
+        with shelve.open(shelve_file, flag='r') as cache:
+            for track_id in cache.keys():
+                entry = cache[track_id]
+                updated_at = entry['timestamp'].timestamp()
+                if updated_at > cutoff:
+                    entries.append((track_id, entry['track_data'], updated_at))
+        self._write(entries)
+        logger.info(f"Migrated {len(entries)} tracks from {shelve_file} to {self.db_file}")
+        return len(entries)
+
+    def stats(self):
+        with self._lock:
+            return {tier: dict(counts) for tier, counts in self._counts.items()}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate a shelve track cache to SQLite")
+    parser.add_argument('shelve_file', nargs='?', default='spotify_cache.db')
+    parser.add_argument('db_file', nargs='?', default='spotify_cache.sqlite')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    SQLiteCache(args.db_file).migrate_from_shelve(args.shelve_file)
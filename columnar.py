@@ -0,0 +1,201 @@
+import os
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('parquet', 'feather')
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+# Parquet row groups carry min/max statistics, so smaller groups let filters
+# skip more of the file
+DEFAULT_ROW_GROUP_SIZE = 16_000
+
+_OPS = {
+    '==': lambda values, value: values == value,
+    '!=': lambda values, value: values != value,
+    '<': lambda values, value: values < value,
+    '<=': lambda values, value: values <= value,
+    '>': lambda values, value: values > value,
+    '>=': lambda values, value: values >= value,
+    'in': lambda values, value: values.isin(value),
+}
+
+
+def find_source(data_dir, stem, data_format='auto'):
+    """Path of the table ``stem`` in data_dir for the given format.
+
+    ``auto`` prefers a Parquet, then a Feather copy over the CSV, as long as
+    it isn't older than the CSV (a stale conversion would serve old data).
+    """
+    csv_path = os.path.join(data_dir, stem + EXTENSIONS['csv'])
+    if data_format != 'auto':
+        if data_format not in EXTENSIONS:
+            raise ValueError(f"Unknown data format {data_format}; expected auto, csv or one of {FORMATS}")
+        return os.path.join(data_dir, stem + EXTENSIONS[data_format])
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    for data_format in FORMATS:
+        path = os.path.join(data_dir, stem + EXTENSIONS[data_format])
+        if not os.path.exists(path):
+            continue
+        if csv_mtime is not None and os.path.getmtime(path) < csv_mtime:
+            logger.warning(f"Ignoring {path}: older than {csv_path}")
+            continue
+        return path
+    return csv_path
+
+
+def source_format(path):
+    for data_format, extension in EXTENSIONS.items():
+        if path.endswith(extension):
+            return data_format
+    raise ValueError(f"Unknown data format for {path}")
+
+
+def read_table(path, columns=None, filters=None, limit=None):
+    """Read ``columns`` of the rows matching ``filters`` as a DataFrame.
+
+    ``filters`` are ``(column, op, value)`` tuples, all of which must hold,
+    with op one of ==, !=, <, <=, >, >= and in. Columns missing from the file
+    are left out. For Parquet and Feather only the requested columns are
+    read and filters are applied during the scan (Parquet also skips row
+    groups whose statistics rule them out); with ``limit`` the scan stops
+    once that many rows match. CSV is parsed, then filtered.
+    """
+    data_format = source_format(path)
+    if data_format == 'csv':
+        header = pd.read_csv(path, nrows=0).columns
+        wanted = list(header) if columns is None else [col for col in columns if col in header]
+        usecols = list(dict.fromkeys(wanted + [column for column, _, _ in filters or ()]))
+        df = pd.read_csv(path, usecols=usecols)
+        return filter_frame(df, filters or (), wanted, limit).reset_index(drop=True)
+
+    # Optional: only columnar sources need pyarrow
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    dataset = ds.dataset(path, format='parquet' if data_format == 'parquet' else 'ipc')
+    if columns is not None:
+        columns = [col for col in columns if col in dataset.schema.names]
+    expression = pq.filters_to_expression(list(filters)) if filters else None
+    if limit is None:
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+    # Without readahead the scan stops decoding at the first batches that fill limit
+    scanner = dataset.scanner(columns=columns, filter=expression, batch_readahead=0, fragment_readahead=0)
+    batches, n_rows = [], 0
+    for batch in scanner.to_batches():
+        batches.append(batch)
+        n_rows += batch.num_rows
+        if n_rows >= limit:
+            break
+    return pa.Table.from_batches(batches, schema=scanner.projected_schema).slice(0, limit).to_pandas()
+
+
+def filter_frame(df, filters, columns=None, limit=None):
+    # read_table's filters applied to a DataFrame already in memory
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        mask &= _OPS[op](df[column], value).to_numpy()
+    df = df[mask]
+    if columns is not None:
+        df = df[[col for col in columns if col in df]]
+    return df if limit is None else df.head(limit)
+
+
+def convert(csv_path, data_format='parquet', out_path=None, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """Write a columnar copy of a CSV next to it (or to out_path).
+
+    Parquet is compressed with zstd and dictionary-encodes repeated strings
+    (genres, artists); Feather is uncompressed so it can be memory-mapped.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if data_format not in FORMATS:
+        raise ValueError(f"Unknown data format {data_format}; expected one of {FORMATS}")
+    out_path = out_path or os.path.splitext(csv_path)[0] + EXTENSIONS[data_format]
+    start = time.perf_counter()
+    # Parsed by pandas like the CSV source, so both load identical floats;
+    # track ids stay strings even where one happens to look numeric
+    table = pa.Table.from_pandas(pd.read_csv(csv_path, dtype={'track_id': str}), preserve_index=False)
+    tmp_path = out_path + '.tmp'
+    if data_format == 'parquet':
+        pq.write_table(table, tmp_path, compression='zstd', row_group_size=row_group_size)
+    else:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, out_path)
+    logger.info(f"Converted {csv_path} ({os.path.getsize(csv_path) / 2**20:.1f} MB) to {out_path} "
+                f"({os.path.getsize(out_path) / 2**20:.1f} MB) in {time.perf_counter() - start:.2f}s")
+    return out_path
+
+
+def compare_load_times(data_dir='data', repeat=5):
+    """Best-of-``repeat`` seconds to load what the model reads, per source format.
+
+    Times the catalog in full (the old load) and projected to the columns
+    the model uses, the ratings, and the sample-category filters as a
+    pushed-down read against filtering the loaded catalog in memory.
+    """
+    from spotify_model import CATALOG_COLUMNS, DISPLAY_COLUMNS, RATING_COLUMNS, SAMPLE_CATEGORIES
+
+    def best(read):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            read()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    results = {}
+    catalog_csv = os.path.join(data_dir, 'data_cleaned.csv')
+    for data_format in ('csv', *FORMATS):
+        catalog = os.path.join(data_dir, 'data_cleaned' + EXTENSIONS[data_format])
+        ratings = os.path.join(data_dir, 'user_matrix' + EXTENSIONS[data_format])
+        if not os.path.exists(catalog):
+            continue
+        row = {
+            'catalog_full': best(lambda: read_table(catalog)),
+            'catalog_projected': best(lambda: read_table(catalog, CATALOG_COLUMNS)),
+            'categories': best(lambda: [read_table(catalog, DISPLAY_COLUMNS, filters, limit=10)
+                                        for filters in SAMPLE_CATEGORIES.values()]),
+        }
+        if os.path.exists(ratings):
+            row['ratings'] = best(lambda: read_table(ratings, RATING_COLUMNS))
+        row['size_mb'] = sum(os.path.getsize(path) for path in (catalog, ratings) if os.path.exists(path)) / 2**20
+        results[data_format] = row
+
+    loaded = read_table(catalog_csv, CATALOG_COLUMNS)
+    results['in_memory'] = {'categories': best(lambda: [filter_frame(loaded, filters, DISPLAY_COLUMNS, limit=10)
+                                                        for filters in SAMPLE_CATEGORIES.values()])}
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert the data CSVs to Parquet/Feather and compare load times")
+    parser.add_argument('command', choices=['convert', 'compare'])
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--format', choices=FORMATS + ('all',), default='all')
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'convert':
+        for data_format in FORMATS if args.format == 'all' else (args.format,):
+            for stem in ('data_cleaned', 'user_matrix'):
+                convert(os.path.join(args.data_dir, stem + '.csv'), data_format,
+                        row_group_size=args.row_group_size)
+    else:
+        results = compare_load_times(args.data_dir, args.repeat)
+        keys = ['catalog_full', 'catalog_projected', 'ratings', 'categories']
+        print(f"{'source':<11}" + ''.join(f"{key + ' ms':>22}" for key in keys) + f"{'MB':>8}")
+        for data_format, row in results.items():
+            print(f"{data_format:<11}"
+                  + ''.join(f"{row[key] * 1000:>22.1f}" if key in row else f"{'-':>22}" for key in keys)
+                  + (f"{row['size_mb']:>8.1f}" if 'size_mb' in row else ''))
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmark import generate_dataset
+from fakes import working_dir
+from spotify_model import SpotifyModel
+
+
+@pytest.fixture(scope='session')
+def dataset_dir(tmp_path_factory):
+    # A small dataset where a fifth of the rated tracks are off the catalog
+    path = tmp_path_factory.mktemp('dataset')
+    generate_dataset(str(path), 2000, n_users=100, ratings_per_user=50, off_catalog=0.2)
+    return path
+
+
+@pytest.fixture(scope='session')
+def make_model(dataset_dir):
+    # SpotifyModel(**params) over dataset_dir; each call loads a fresh model
+    def make(**params):
+        with working_dir(dataset_dir):
+            return SpotifyModel(**params)
+    return make
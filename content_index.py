@@ -0,0 +1,221 @@
+import time
+import logging
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ContentIndex(ABC):
+    """Nearest-neighbour search over the scaled content features.
+
+    ``query`` follows ``NearestNeighbors.kneighbors``: it returns
+    ``(distances, indices)`` arrays of shape ``(n_queries, k)``, nearest first.
+    ``metric`` and ``metric_params`` name the distance it ranks by.
+    """
+
+    metric_params = {}
+
+    @abstractmethod
+    def query(self, vectors, k):
+        ...
+
+
+class ExactContentIndex(ContentIndex):
+    def __init__(self, nn_model):
+        self.nn_model = nn_model
+
+    @property
+    def metric(self):
+        return _metric_of(self.nn_model)
+
+    @property
+    def metric_params(self):
+        # Such as p for minkowski; none once minkowski p=2 reads as euclidean
+        if self.metric == 'euclidean':
+            return {}
+        params = getattr(self.nn_model, 'effective_metric_params_', None) or self.nn_model.metric_params or {}
+        return {name: value for name, value in params.items() if value is not None}
+
+    def query(self, vectors, k):
+        return self.nn_model.kneighbors(vectors, n_neighbors=k)
+
+
+class IVFContentIndex(ContentIndex):
+    """Inverted-file index: k-means coarse lists, exact re-ranking within them.
+
+    Build knobs: ``n_lists`` (defaults to sqrt(n)), ``n_iter`` and
+    ``train_size`` for k-means. Query knob: ``n_probe``, the number of
+    nearest lists scanned per query; more lists means higher recall.
+    """
+
+    def __init__(self, data, metric='cosine', n_lists=None, n_probe=8,
+                 n_iter=15, train_size=None, seed=0):
+        if metric not in ('cosine', 'euclidean'):
+            raise ValueError(f"Unsupported metric for IVF index: {metric}")
+        self.metric = metric
+        self.n_probe = n_probe
+        vectors = self._prepare(np.asarray(data, dtype=np.float64))
+        n = len(vectors)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n)))
+
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        train_size = min(n, train_size or 64 * self.n_lists)
+        sample = vectors[rng.choice(n, train_size, replace=False)]
+        self.centroids = self._kmeans(sample, self.n_lists, n_iter, rng)
+
+        # Store vectors grouped by list so each probed list is one slice
+        assignments = self._nearest_centroid(vectors)
+        self.order = np.argsort(assignments, kind='stable')
+        self.vectors = vectors[self.order]
+        self.offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=self.n_lists), out=self.offsets[1:])
+        logger.info(f"Built IVF index over {n} tracks with {self.n_lists} lists "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    @classmethod
+    def from_nn_model(cls, nn_model, data, **params):
+        return cls(data, metric=_metric_of(nn_model), **params)
+
+    def _prepare(self, vectors):
+        # Cosine distance becomes a dot product over unit-length rows
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+    def _distances(self, query, vectors):
+        if self.metric == 'cosine':
+            return 1 - vectors @ query
+        return np.sqrt(np.maximum(((vectors - query) ** 2).sum(axis=1), 0))
+
+    def _nearest_centroid(self, vectors, chunk_size=65536):
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        centroid_norms = (self.centroids ** 2).sum(axis=1)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+            assignments[start:start + chunk_size] = np.argmin(
+                centroid_norms - 2 * chunk @ self.centroids.T, axis=1
+            )
+        return assignments
+
+    def _kmeans(self, sample, n_lists, n_iter, rng):
+        self.centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignments = self._nearest_centroid(sample)
+            counts = np.bincount(assignments, minlength=n_lists)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, sample)
+            filled = counts > 0
+            self.centroids[filled] = sums[filled] / counts[filled, None]
+            # Re-seed empty lists from random sample points
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                self.centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        return self.centroids
+
+    def query(self, vectors, k, n_probe=None):
+        n_probe = n_probe or self.n_probe
+        queries = self._prepare(np.atleast_2d(np.asarray(vectors, dtype=np.float64)))
+        centroid_norms = (self.centroids ** 2).sum(axis=1)
+        list_order = np.argsort(centroid_norms - 2 * queries @ self.centroids.T, axis=1)
+        sizes = np.diff(self.offsets)
+
+        distances = np.empty((len(queries), k))
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        for row, query in enumerate(queries):
+            # Probe n_probe lists, and more if they hold fewer than k tracks
+            probe = list_order[row]
+            n_lists = max(n_probe, int(np.searchsorted(np.cumsum(sizes[probe]), k)) + 1)
+            probe = probe[:n_lists]
+            candidates = np.concatenate([
+                np.arange(self.offsets[l], self.offsets[l + 1]) for l in probe
+            ])
+            if len(candidates) < k:
+                raise ValueError(f"Expected n_neighbors <= n_samples, but n_samples = "
+                                 f"{len(candidates)}, n_neighbors = {k}")
+            cand_distances = self._distances(query, self.vectors[candidates])
+            top = np.argpartition(cand_distances, k - 1)[:k]
+            top = top[np.argsort(cand_distances[top], kind='stable')]
+            distances[row] = cand_distances[top]
+            indices[row] = self.order[candidates[top]]
+        return distances, indices
+
+
+def _metric_of(nn_model):
+    metric = getattr(nn_model, 'effective_metric_', None) or nn_model.metric
+    if metric == 'minkowski' and getattr(nn_model, 'p', 2) == 2:
+        return 'euclidean'
+    return metric
+
+
+def candidate_distances(queries, candidates, metric, metric_params=None):
+    # Distance from each query row to each of its own candidate vectors:
+    # (n, d) and (n, c, d) -> (n, c), as kneighbors would report them
+    n, c, d = candidates.shape
+    if metric == 'cosine':
+        dots = (candidates @ queries[:, :, None])[:, :, 0]
+        norms = np.linalg.norm(queries, axis=1)[:, None] * np.linalg.norm(candidates, axis=2)
+        return 1 - dots / np.where(norms == 0, 1, norms)
+    if metric == 'euclidean':
+        return np.linalg.norm(candidates - queries[:, None, :], axis=2)
+    # Any other metric NearestNeighbors accepts, one query at a time
+    from sklearn.metrics import pairwise_distances
+    distances = np.empty((n, c))
+    for row in range(n if c else 0):
+        distances[row] = pairwise_distances(queries[row:row + 1], candidates[row], metric=metric,
+                                            **(metric_params or {}))[0]
+    return distances
+
+
+def build_content_index(nn_model, data, backend='exact', **params):
+    if backend == 'exact':
+        return ExactContentIndex(nn_model)
+    if backend == 'ivf':
+        return IVFContentIndex.from_nn_model(nn_model, data, **params)
+    raise ValueError(f"Unknown content index backend: {backend}")
+
+
+def recall_report(exact_index, approx_index, data, k=10, n_queries=500,
+                  n_probes=(1, 2, 4, 8, 16, 32), seed=0):
+    # recall@k and per-query latency of the approximate index against exact search
+    rng = np.random.default_rng(seed)
+    queries = np.asarray(data)[rng.choice(len(data), min(n_queries, len(data)), replace=False)]
+
+    def timed(search):
+        start = time.perf_counter()
+        results = [search(query.reshape(1, -1))[1][0] for query in queries]
+        return np.array(results), (time.perf_counter() - start) / len(queries) * 1000
+
+    truth, exact_ms = timed(lambda q: exact_index.query(q, k))
+    rows = [{'backend': 'exact', 'n_probe': None, 'recall': 1.0, 'latency_ms': exact_ms}]
+    for n_probe in n_probes:
+        found, approx_ms = timed(lambda q: approx_index.query(q, k, n_probe=n_probe))
+        hits = sum(len(np.intersect1d(a, b)) for a, b in zip(truth, found))
+        rows.append({'backend': 'ivf', 'n_probe': n_probe,
+                     'recall': hits / truth.size, 'latency_ms': approx_ms})
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+    from spotify_model import SpotifyModel
+
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of the IVF content index")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--n-lists', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    model = SpotifyModel()
+    exact = ExactContentIndex(model.nn_model_content)
+    approx = IVFContentIndex.from_nn_model(model.nn_model_content, model.data_content_scaled,
+                                           n_lists=args.n_lists)
+    print(f"{'backend':<8}{'n_probe':>8}{'recall@' + str(args.k):>12}{'ms/query':>10}")
+    for row in recall_report(exact, approx, model.data_content_scaled, k=args.k, n_queries=args.queries):
+        n_probe = '-' if row['n_probe'] is None else row['n_probe']
+        print(f"{row['backend']:<8}{n_probe:>8}{row['recall']:>12.3f}{row['latency_ms']:>10.3f}")
@@ -0,0 +1,53 @@
+import os
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class FakeSpotifyClient:
+    """Offline stand-in for spotipy.Spotify: tracks() and audio_features()
+    return deterministic data for any id, so no network calls are made.
+    ``batches`` records the ids of every call per endpoint."""
+
+    def __init__(self):
+        self.calls = 0
+        self.batches = {'tracks': [], 'audio_features': []}
+
+    @staticmethod
+    def _rng(track_id):
+        return np.random.default_rng(zlib.crc32(track_id.encode()))
+
+    def tracks(self, track_ids):
+        self.calls += 1
+        self.batches['tracks'].append(list(track_ids))
+        return {'tracks': [{
+            'id': track_id,
+            'name': f"Fake {track_id[:6]}",
+            'artists': [{'name': 'Fake Artist'}],
+            'popularity': int(self._rng(track_id).integers(0, 100)),
+        } for track_id in track_ids]}
+
+    def audio_features(self, track_ids):
+        self.calls += 1
+        self.batches['audio_features'].append(list(track_ids))
+        features = []
+        for track_id in track_ids:
+            values = self._rng(track_id).random(7)
+            features.append({
+                'danceability': values[0], 'energy': values[1], 'acousticness': values[2],
+                'instrumentalness': values[3], 'liveness': values[4], 'valence': values[5],
+                'tempo': 60 + 140 * values[6],
+            })
+        return features
+
+
+@contextmanager
+def working_dir(path):
+    # SpotifyModel reads data/ and the pickles relative to the working directory
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,84 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NORMALIZATIONS = ('max', 'minmax', 'none')
+# Sort key for empty candidate slots, after every real key
+_NO_KEY = np.iinfo(np.int64).max
+
+
+class HybridFusion:
+    """Candidate pools, weights and normalization of the hybrid re-rank.
+
+    Each request takes ``content_pool`` content neighbours and the
+    ``collaborative_pool`` best SVD items (both at least top_n), merges them,
+    scores every candidate on both signals and ranks by
+    ``content_weight * content + collaborative_weight * collaborative`` after
+    per-request normalization of each signal over the candidates:
+
+    - ``max``: divide by the largest score
+    - ``minmax``: rescale to [0, 1]
+    - ``none``: raw similarity and predicted rating
+
+    A signal a candidate has no score for (content for tracks outside the
+    catalog) counts as 0. Requests without collaborative scores rank by
+    content alone. The default pools fit within the default precomputed
+    tables (50 content neighbours, 200 collaborative items).
+    """
+
+    def __init__(self, content_pool=40, collaborative_pool=100, content_weight=0.6,
+                 collaborative_weight=0.4, normalization='max'):
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization {normalization}; expected one of {NORMALIZATIONS}")
+        if content_pool < 1 or collaborative_pool < 0:
+            raise ValueError("Candidate pools must be positive")
+        if content_weight < 0 or collaborative_weight < 0 or content_weight + collaborative_weight == 0:
+            raise ValueError("Weights must be non-negative and not both zero")
+        self.content_pool = content_pool
+        self.collaborative_pool = collaborative_pool
+        self.content_weight = content_weight
+        self.collaborative_weight = collaborative_weight
+        self.normalization = normalization
+
+    def pools(self, top_n):
+        return max(self.content_pool, top_n), max(self.collaborative_pool, top_n)
+
+    def key(self, top_n):
+        # Everything a fused list depends on besides the inputs; lists with
+        # the same key nest, so a longer one answers a shorter top_n
+        return (*self.pools(top_n), self.content_weight, self.collaborative_weight, self.normalization)
+
+    @staticmethod
+    def merge(content_keys, content_valid, collaborative_keys, collaborative_valid):
+        # Union of both candidate lists per row, sorted by key with duplicates
+        # dropped; returns (keys, valid)
+        keys = np.where(np.hstack([content_valid, collaborative_valid]),
+                        np.hstack([content_keys, collaborative_keys]), _NO_KEY)
+        keys.sort(axis=1)
+        valid = keys != _NO_KEY
+        valid[:, 1:] &= keys[:, 1:] != keys[:, :-1]
+        return keys, valid
+
+    def normalize(self, scores, valid):
+        # Row-wise over valid, finite scores; everything else becomes 0
+        present = valid & np.isfinite(scores)
+        if self.normalization == 'none':
+            return np.where(present, scores, 0.0)
+        high = np.where(present, scores, -np.inf).max(axis=1, initial=-np.inf)[:, None]
+        if self.normalization == 'max':
+            scale = np.where(np.isfinite(high) & (high != 0), high, 1.0)
+            return np.where(present, scores / scale, 0.0)
+        low = np.where(present, scores, np.inf).min(axis=1, initial=np.inf)[:, None]
+        span = np.where(np.isfinite(high) & (high > low), high - low, 1.0)
+        return np.where(present, (scores - np.where(np.isfinite(low), low, 0.0)) / span, 0.0)
+
+    def fuse(self, content_scores, collaborative_scores, valid, with_collaborative=True):
+        # (content, collaborative, final) normalized scores; empty slots rank last
+        content = self.normalize(content_scores, valid)
+        collaborative = self.normalize(collaborative_scores, valid)
+        if with_collaborative:
+            final = self.content_weight * content + self.collaborative_weight * collaborative
+        else:
+            final = content
+        return content, collaborative, np.where(valid, final, -np.inf)
@@ -0,0 +1,204 @@
+import io
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics import NULL_METRICS
+
+logger = logging.getLogger(__name__)
+
+RATING_COLUMNS = ['user_id', 'track_id', 'rating']
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def read_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    # user_matrix.csv-style file (with a header) as DataFrames of chunksize rows
+    yield from pd.read_csv(path, usecols=RATING_COLUMNS, dtype={'track_id': str}, chunksize=chunksize)
+
+
+class LogTail:
+    """Reads ratings appended to a CSV log since the last read.
+
+    The log is ``user_id,track_id,rating`` lines, optionally starting with
+    that header. Only complete lines are consumed, so a writer may be midway
+    through a line. ``offset`` is the byte position reached; a log that
+    shrinks below it is taken to have been rotated and is read from the
+    start.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+
+    def read(self, max_bytes=16 << 20):
+        try:
+            with open(self.path, 'rb') as file:
+                size = os.fstat(file.fileno()).st_size
+                if size < self.offset:
+                    logger.warning(f"{self.path} shrank below offset {self.offset}; reading from the start")
+                    self.offset = 0
+                file.seek(self.offset)
+                data = file.read(max_bytes)
+        except FileNotFoundError:
+            return _empty_ratings()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return _empty_ratings()
+        data = data[:end]
+        if self.offset == 0 and data.startswith(b'user_id'):
+            data = data[data.index(b'\n') + 1:]
+        self.offset += end
+        if not data.strip():
+            return _empty_ratings()
+        return pd.read_csv(io.BytesIO(data), names=RATING_COLUMNS, header=None,
+                           dtype={'track_id': str}, on_bad_lines='skip')
+
+
+def _empty_ratings():
+    return pd.DataFrame({column: pd.Series(dtype=object) for column in RATING_COLUMNS})
+
+
+class RatingsIngester:
+    """Applies ratings to a running SpotifyModel in chunks, without a restart.
+
+    Each chunk becomes one ``SpotifyModel.apply_ratings`` call, so a
+    request in flight sees the ratings from before or after the whole chunk,
+    never part of it. With ``fold_in`` the users in a chunk are refitted as
+    their ratings arrive; without it only the user/item index and new_df
+    grow (exclusions and fingerprints stay current, SVD scores wait for a
+    retrain), which is several times faster for bulk loads.
+
+    ``stats()`` reports rows applied, rows skipped as malformed and
+    throughput in rows per second.
+    """
+
+    def __init__(self, model, chunksize=DEFAULT_CHUNKSIZE, fold_in=True, n_epochs=5,
+                 result_cache=None, metrics=None):
+        self.model = model
+        self.chunksize = chunksize
+        self.fold_in = fold_in
+        self.n_epochs = n_epochs
+        # Results lapse on their own once fingerprints change; dropping them
+        # eagerly just frees the space
+        self.result_cache = result_cache
+        self.metrics = metrics or NULL_METRICS
+        self._lock = threading.Lock()
+        self._stats = {'rows': 0, 'skipped': 0, 'chunks': 0, 'users': 0, 'seconds': 0.0}
+
+    def apply(self, chunk):
+        # Clean and apply one chunk; returns the number of rows applied
+        rows = _clean(chunk)
+        skipped = len(chunk) - len(rows)
+        if skipped:
+            logger.warning(f"Skipping {skipped} malformed ratings")
+            self.metrics.increment('ingest_rows', skipped, result='skipped')
+        if rows.empty:
+            with self._lock:
+                self._stats['skipped'] += skipped
+            return 0
+        start = time.perf_counter()
+        with self.metrics.timer('ingest_chunk_seconds'):
+            users = self.model.apply_ratings(rows, n_epochs=self.n_epochs, fold_in=self.fold_in)
+        seconds = time.perf_counter() - start
+        if self.result_cache is not None:
+            for user_id in users:
+                self.result_cache.invalidate_user(user_id)
+        self.metrics.increment('ingest_rows', len(rows), result='applied')
+        with self._lock:
+            self._stats['rows'] += len(rows)
+            self._stats['skipped'] += skipped
+            self._stats['chunks'] += 1
+            self._stats['users'] += len(users)
+            self._stats['seconds'] += seconds
+        logger.debug(f"Applied {len(rows)} ratings for {len(users)} users "
+                     f"in {seconds * 1000:.1f}ms ({len(rows) / seconds:,.0f} rows/s)")
+        return len(rows)
+
+    def ingest_csv(self, path):
+        # Stream a whole CSV file in; returns stats() for this file alone
+        before = self.stats()
+        start = time.perf_counter()
+        for chunk in read_csv_chunks(path, self.chunksize):
+            self.apply(chunk)
+        stats = self.stats()
+        rows = stats['rows'] - before['rows']
+        elapsed = time.perf_counter() - start
+        logger.info(f"Ingested {rows} ratings from {path} in {elapsed:.2f}s "
+                    f"({rows / elapsed if elapsed else 0:,.0f} rows/s end to end)")
+        return {**{key: stats[key] - before[key] for key in ('rows', 'skipped', 'chunks', 'users', 'seconds')},
+                'elapsed': elapsed, 'rows_per_second': rows / elapsed if elapsed else 0.0}
+
+    def follow(self, path, interval=1.0, stop=None, offset=0):
+        # Tail an append-only log until stop is set, applying what arrives
+        tail = LogTail(path, offset)
+        stop = stop or threading.Event()
+        # A log that never runs dry still stops between reads
+        while not stop.is_set():
+            chunk = tail.read()
+            for first in range(0, len(chunk), self.chunksize):
+                try:
+                    self.apply(chunk.iloc[first:first + self.chunksize])
+                except Exception as e:
+                    logger.error(f"Error ingesting ratings from {path}: {str(e)}")
+            if len(chunk) == 0:
+                stop.wait(interval)
+        return tail.offset
+
+    def start_follow(self, path, interval=1.0, offset=0):
+        # follow() in a daemon thread until the returned event is set
+        stop = threading.Event()
+        threading.Thread(target=self.follow, args=(path, interval, stop, offset),
+                         name='ratings-ingest', daemon=True).start()
+        return stop
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+
+def _clean(chunk):
+    # Well-formed (int user_id, str track_id, float rating) rows only
+    user_ids = pd.to_numeric(chunk['user_id'], errors='coerce')
+    ratings = pd.to_numeric(chunk['rating'], errors='coerce')
+    valid = (user_ids.notna() & ratings.notna() & chunk['track_id'].notna()
+             & (user_ids == np.floor(user_ids))).to_numpy()
+    return pd.DataFrame({
+        'user_id': user_ids[valid].astype(np.int64).to_numpy(),
+        'track_id': chunk['track_id'][valid].astype(str).to_numpy(dtype=object),
+        'rating': ratings[valid].astype(np.float64).to_numpy(),
+    })
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream ratings into a loaded model and report throughput")
+    parser.add_argument('path', help="CSV of user_id,track_id,rating (or an append-only log with --follow)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--no-fold-in', action='store_true', help="index the ratings only")
+    parser.add_argument('--follow', action='store_true', help="keep tailing the file until Ctrl-C")
+    parser.add_argument('--artifact-dir', default=None)
+    parser.add_argument('--model-dir', default=None)
+    parser.add_argument('--compact', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from spotify_model import SpotifyModel
+    model = SpotifyModel(artifact_dir=args.artifact_dir, model_dir=args.model_dir, compact=args.compact)
+    ingester = RatingsIngester(model, chunksize=args.chunksize, fold_in=not args.no_fold_in)
+    if args.follow:
+        try:
+            ingester.follow(args.path)
+        except KeyboardInterrupt:
+            pass
+    else:
+        ingester.ingest_csv(args.path)
+    stats = ingester.stats()
+    print(f"{stats['rows']} rows in {stats['chunks']} chunks ({stats['skipped']} skipped), "
+          f"{stats['users']} user updates, {stats['rows_per_second']:,.0f} rows/s")
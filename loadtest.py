@@ -0,0 +1,142 @@
+import sys
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ('content', 'collaborative', 'hybrid', 'batch')
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection to the service."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def post(self, path, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode()
+        self.writer.write(f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                          .encode('latin-1') + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection') == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def make_payload(rng, endpoint, track_ids, n_users, top_n, batch_size):
+    user_id = int(rng.integers(1, n_users + 1))
+    track_id = str(track_ids[rng.integers(0, len(track_ids))])
+    if endpoint == 'content':
+        return {'track_id': track_id, 'top_n': top_n}
+    if endpoint == 'collaborative':
+        return {'user_id': user_id, 'top_n': top_n}
+    if endpoint == 'hybrid':
+        return {'user_id': user_id, 'track_id': track_id, 'top_n': top_n}
+    return {'top_n': top_n, 'pairs': [
+        {'user_id': int(rng.integers(1, n_users + 1)), 'track_id': str(track_ids[i])}
+        for i in rng.integers(0, len(track_ids), batch_size)
+    ]}
+
+
+async def run(url, track_ids, n_users, endpoints, concurrency=8, duration=30.0, top_n=10,
+              batch_size=32, seed=0):
+    # Closed loop: each client sends its next request as soon as the last returns
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies = {endpoint: [] for endpoint in endpoints}
+    statuses = {}
+
+    async def client(index):
+        rng = np.random.default_rng(seed + index)
+        connection = Connection(parts.hostname, parts.port or 80)
+        try:
+            while time.perf_counter() < deadline:
+                endpoint = endpoints[rng.integers(0, len(endpoints))]
+                payload = make_payload(rng, endpoint, track_ids, n_users, top_n, batch_size)
+                start = time.perf_counter()
+                try:
+                    status = await connection.post(f"/recommend/{endpoint}", payload)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    logger.warning(f"Connection failed: {e}")
+                    connection.close()
+                    status = 'connection_error'
+                latencies[endpoint].append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+def summarize(latencies, statuses, elapsed):
+    results = {}
+    for endpoint, seconds in latencies.items():
+        if not seconds:
+            continue
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+        results[endpoint] = {'n': len(seconds), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+                             'qps': len(seconds) / elapsed}
+    total = sum(len(seconds) for seconds in latencies.values())
+    return {'endpoints': results, 'statuses': statuses, 'seconds': elapsed, 'qps': total / elapsed}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load test a running recommendation service")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--catalog', default='data/data_cleaned.csv', help="seed track ids are drawn from here")
+    parser.add_argument('--users', type=int, default=1000, help="user ids are drawn from 1..users")
+    parser.add_argument('--endpoints', default='content,collaborative,hybrid')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds")
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32, help="pairs per batch request")
+    parser.add_argument('--out', default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    endpoints = args.endpoints.split(',')
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    track_ids = pd.read_csv(args.catalog, usecols=['track_id'])['track_id'].to_numpy()
+    report = asyncio.run(run(args.url, track_ids, args.users, endpoints, concurrency=args.concurrency,
+                             duration=args.duration, top_n=args.top_n, batch_size=args.batch_size))
+
+    print(f"{'endpoint':<15}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'qps':>10}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:<15}{stats['n']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['qps']:>10.1f}")
+    print(f"total {report['qps']:.1f} req/s over {report['seconds']:.1f}s, statuses {report['statuses']}",
+          file=sys.stderr)
+    if args.out:
+        with open(args.out, 'w') as file:
+            json.dump(report, file, indent=2, default=str)
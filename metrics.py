@@ -0,0 +1,250 @@
+import json
+import time
+import bisect
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self._lock:
+            counts = list(self._counts)
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total_seconds = self._sum
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            cumulative.append((bound, seen))
+        return {'count': seen, 'sum': total_seconds, 'buckets': cumulative}
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Named latency histograms and counters, each with optional labels.
+
+    ``timer('stage_seconds', stage='svd_scoring')`` times a block,
+    ``increment('cache_requests', tier='memory', result='hit')`` counts.
+    Export with ``prometheus_text()`` or ``log_snapshot()``.
+    """
+
+    enabled = True
+
+    def __init__(self, namespace='spotify_recommender', buckets=DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def histogram(self, name, **labels):
+        key = self._key(name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram(self.buckets))
+        return histogram
+
+    def timer(self, name, **labels):
+        return _Timer(self.histogram(name, **labels))
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = dict(self._counters)
+        return {
+            'histograms': [{'name': name, 'labels': dict(labels), **histogram.snapshot()}
+                           for (name, labels), histogram in histograms],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in counters.items()],
+            'cache_hit_ratio': self._hit_ratios(counters),
+        }
+
+    @staticmethod
+    def _hit_ratios(counters):
+        # Per cache tier, from cache_requests{tier, result}
+        totals = {}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if name == 'cache_requests':
+                hits, total = totals.get(labels['tier'], (0, 0))
+                totals[labels['tier']] = (hits + value * (labels['result'] == 'hit'), total + value)
+        return {tier: hits / total for tier, (hits, total) in totals.items() if total}
+
+    def prometheus_text(self):
+        # Prometheus text exposition format (version 0.0.4)
+        def series(name, labels, extra=()):
+            pairs = [*labels.items(), *extra]
+            if not pairs:
+                return name
+            return name + '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+        snapshot = self.snapshot()
+        lines = []
+        for kind, entries in (('histogram', snapshot['histograms']), ('counter', snapshot['counters'])):
+            seen = set()
+            for entry in sorted(entries, key=lambda entry: entry['name']):
+                suffix = '_seconds' if kind == 'histogram' and not entry['name'].endswith('_seconds') else ''
+                suffix = '_total' if kind == 'counter' else suffix
+                name = f"{self.namespace}_{entry['name']}{suffix}"
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} {kind}")
+                if kind == 'counter':
+                    lines.append(f"{series(name, entry['labels'])} {entry['value']}")
+                    continue
+                for bound, count in entry['buckets']:
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{series(name + '_bucket', entry['labels'], [('le', le)])} {count}")
+                lines.append(f"{series(name + '_sum', entry['labels'])} {entry['sum']}")
+                lines.append(f"{series(name + '_count', entry['labels'])} {entry['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        # p50/p95/p99 per histogram, counters and cache hit ratios
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = dict(self._counters)
+        summary = {
+            'latency_ms': {
+                series_name(name, dict(labels)): {
+                    'count': histogram.count,
+                    **{f"p{q}": _ms(histogram.quantile(q / 100)) for q in (50, 95, 99)},
+                }
+                for (name, labels), histogram in histograms
+            },
+            'counters': {series_name(name, dict(labels)): value for (name, labels), value in counters.items()},
+            'cache_hit_ratio': self._hit_ratios(counters),
+        }
+        return summary
+
+    def log_snapshot(self, sink=None):
+        # One structured (JSON) log record of summary()
+        summary = self.summary()
+        (sink or logger).info(json.dumps({'metrics': summary}))
+        return summary
+
+    def start_log_sink(self, interval=60, sink=None):
+        # Log a snapshot every interval seconds until the returned event is set
+        def run():
+            while not stop.wait(interval):
+                self.log_snapshot(sink)
+
+        stop = threading.Event()
+        threading.Thread(target=run, name='metrics-log-sink', daemon=True).start()
+        return stop
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics:
+    """Disabled metrics: the same calls as Metrics, doing nothing."""
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, name, **labels):
+        return self._timer
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+    def increment(self, name, value=1, **labels):
+        pass
+
+    def snapshot(self):
+        return {'histograms': [], 'counters': [], 'cache_hit_ratio': {}}
+
+    def prometheus_text(self):
+        return ''
+
+    def summary(self):
+        return {'latency_ms': {}, 'counters': {}, 'cache_hit_ratio': {}}
+
+    def log_snapshot(self, sink=None):
+        return self.summary()
+
+
+NULL_METRICS = NullMetrics()
+
+
+def series_name(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f"{key}={value}" for key, value in labels.items()) + '}'
+
+
+def _ms(seconds):
+    # Bucket upper bound in ms; None when empty or beyond the last bucket
+    if seconds is None or seconds == float('inf'):
+        return None
+    return seconds * 1000
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+logger = logging.getLogger(__name__)
+
+CONTENT_NEIGHBOURS = 'content_neighbours'
+COLLABORATIVE_TOP_N = 'collaborative_top_n'
+TOP_N_ARRAYS = ('users', 'items', 'scores', 'fingerprints')
+
+
+def _table_paths(out_dir, name):
+    return (os.path.join(out_dir, f"{name}.json"),
+            os.path.join(out_dir, f"{name}_indices.npy"),
+            os.path.join(out_dir, f"{name}_distances.npy"))
+
+
+def _publish(meta_path, replacements, meta):
+    # Readers only load a table whose metadata exists, so drop the old
+    # metadata first and write the new one after the arrays are in place
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for tmp_path, path in replacements:
+        os.replace(tmp_path, path)
+    with open(meta_path + '.tmp', 'w') as file:
+        json.dump(meta, file, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def items_digest(item_ids):
+    # Identifies the item order that materialized positions refer to
+    digest = hashlib.blake2b(digest_size=16)
+    for item_id in item_ids:
+        digest.update(str(item_id).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class NeighbourTable:
+    """Precomputed top-K content neighbours for every catalog row.
+
+    Row ``i`` holds the ``k`` nearest catalog rows to row ``i`` (the row
+    itself included, as ``kneighbors`` returns it), nearest first. Both
+    arrays are fixed-width and opened as read-only memory maps.
+    """
+
+    def __init__(self, meta, indices, distances):
+        self.meta = meta
+        self.indices = indices
+        self.distances = distances
+
+    @property
+    def k(self):
+        return self.indices.shape[1]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def lookup(self, rows, k):
+        # Same (distances, indices) layout as ContentIndex.query
+        return self.distances[rows, :k].astype(np.float64), self.indices[rows, :k].astype(np.int64)
+
+
+def load_content_neighbours(path):
+    meta_path, indices_path, distances_path = _table_paths(path, CONTENT_NEIGHBOURS)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as file:
+        meta = json.load(file)
+    return NeighbourTable(meta, np.load(indices_path, mmap_mode='r'),
+                          np.load(distances_path, mmap_mode='r'))
+
+
+# Worker state, set once per process by the pool initializers
+_worker = {}
+
+
+def _init_neighbour_worker(data_path, nn_params, indices_path, distances_path):
+    data = np.load(data_path, mmap_mode='r')
+    _worker['data'] = data
+    _worker['nn_model'] = NearestNeighbors(**nn_params).fit(data)
+    _worker['indices'] = np.load(indices_path, mmap_mode='r+')
+    _worker['distances'] = np.load(distances_path, mmap_mode='r+')
+
+
+def _neighbour_chunk(start, stop):
+    # Each worker writes its own row range straight into the output maps
+    k = _worker['indices'].shape[1]
+    distances, indices = _worker['nn_model'].kneighbors(_worker['data'][start:stop], n_neighbors=k)
+    _worker['indices'][start:stop] = indices
+    _worker['distances'][start:stop] = distances
+    _worker['indices'].flush()
+    _worker['distances'].flush()
+    return stop - start
+
+
+def build_content_neighbours(model, out_dir, k=50, chunk_size=2048, workers=None):
+    # Top-k neighbours of every row of data_content_scaled, in parallel chunks
+    data = np.ascontiguousarray(model.data_content_scaled)
+    n = len(data)
+    k = min(k, n)
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path, indices_path, distances_path = _table_paths(out_dir, CONTENT_NEIGHBOURS)
+
+    start = time.perf_counter()
+    # Workers read the matrix from disk rather than through pickled task arguments
+    data_path = os.path.join(out_dir, f"{CONTENT_NEIGHBOURS}_input.tmp.npy")
+    np.save(data_path, data)
+    indices_tmp = indices_path + '.tmp'
+    distances_tmp = distances_path + '.tmp'
+    np.lib.format.open_memmap(indices_tmp, mode='w+', dtype=np.int32, shape=(n, k)).flush()
+    np.lib.format.open_memmap(distances_tmp, mode='w+', dtype=np.float32, shape=(n, k)).flush()
+
+    nn_params = model.nn_model_content.get_params()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_neighbour_worker,
+                                 initargs=(data_path, nn_params, indices_tmp, distances_tmp)) as pool:
+            starts = range(0, n, chunk_size)
+            done = sum(pool.map(_neighbour_chunk, starts, [min(s + chunk_size, n) for s in starts]))
+    finally:
+        os.remove(data_path)
+    if done != n:
+        raise RuntimeError(f"Neighbour table covers {done} of {n} tracks")
+
+    meta = {
+        'model_version': model.version,
+        'n_tracks': n,
+        'k': k,
+        'metric': nn_params.get('metric'),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    _publish(meta_path, [(indices_tmp, indices_path), (distances_tmp, distances_path)], meta)
+    logger.info(f"Precomputed {k} content neighbours for {n} tracks "
+                f"in {time.perf_counter() - start:.2f}s")
+    return meta
+
+
+class TopNTable:
+    """Materialized collaborative top-N per user.
+
+    Row ``i`` holds user ``users[i]``'s best ``n`` items as positions into
+    ``UserItemIndex.item_ids`` (best first, -1 padded) with their SVD scores,
+    plus the fingerprint of the ratings it was computed from.
+    """
+
+    def __init__(self, meta, users, items, scores, fingerprints):
+        self.meta = meta
+        self.users = users
+        self.items = items
+        self.scores = scores
+        self.fingerprints = fingerprints
+        self.user_rows = {user: row for row, user in enumerate(users.tolist())}
+
+    @property
+    def n(self):
+        return self.items.shape[1]
+
+    def row(self, user_id, fingerprint):
+        # None when the user is missing or has rated something since the build
+        row = self.user_rows.get(user_id)
+        if row is None or int(self.fingerprints[row]) != fingerprint:
+            return None
+        return row
+
+
+def load_collaborative_top_n(path):
+    meta_path = os.path.join(path, f"{COLLABORATIVE_TOP_N}.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as file:
+        meta = json.load(file)
+    arrays = {name: np.load(os.path.join(path, f"{COLLABORATIVE_TOP_N}_{name}.npy"), mmap_mode='r')
+              for name in TOP_N_ARRAYS}
+    return TopNTable(meta, **arrays)
+
+
+def _init_top_n_worker(svd_scorer, user_items, n):
+    # Under fork the scorer is inherited rather than pickled per worker
+    _worker.update(svd_scorer=svd_scorer, user_items=user_items, n=n)
+
+
+def _top_n_chunk(user_ids):
+    svd_scorer, user_items, n = _worker['svd_scorer'], _worker['user_items'], _worker['n']
+    scores = svd_scorer.user_scores_many(user_ids)
+    top, valid = svd_scorer.top_n_many(scores, n, exclude=user_items.exclusion_masks(user_ids))
+    items = np.full((len(user_ids), n), -1, dtype=np.int32)
+    top_scores = np.full((len(user_ids), n), np.nan, dtype=np.float32)
+    width = top.shape[1]
+    items[:, :width] = np.where(valid, top, -1)
+    top_scores[:, :width] = np.where(valid, np.take_along_axis(scores, top, axis=1), np.nan)
+    return items, top_scores
+
+
+def build_collaborative_top_n(model, out_dir, n=200, chunk_size=128, workers=None, incremental=True):
+    # Top-n SVD candidates for every user in new_df. With incremental=True,
+    # rows of an existing table for the same model are kept for users whose
+    # ratings fingerprint is unchanged; only the rest are rescored.
+    model.wait_for_collaborative()
+    _, user_items, svd_scorer = model.collaborative_snapshot()
+    if svd_scorer is None or user_items is None:
+        raise RuntimeError("Collaborative model is not available")
+
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, f"{COLLABORATIVE_TOP_N}.json")
+    users = user_items.user_ids
+    fingerprints = np.array([user_items.fingerprint(user) for user in users.tolist()], dtype=np.uint64)
+    digest = items_digest(user_items.item_ids)
+
+    items = np.full((len(users), n), -1, dtype=np.int32)
+    scores = np.full((len(users), n), np.nan, dtype=np.float32)
+    stale = np.ones(len(users), dtype=bool)
+    previous = load_collaborative_top_n(out_dir) if incremental else None
+    if (previous is not None and previous.meta['model_version'] == model.version
+            and previous.meta['items_digest'] == digest and previous.n == n):
+        for row, user in enumerate(users.tolist()):
+            old_row = previous.row(user, int(fingerprints[row]))
+            if old_row is not None:
+                items[row] = previous.items[old_row]
+                scores[row] = previous.scores[old_row]
+                stale[row] = False
+        del previous
+
+    stale_rows = np.flatnonzero(stale)
+    if len(stale_rows):
+        chunks = [stale_rows[i:i + chunk_size] for i in range(0, len(stale_rows), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_top_n_worker,
+                                 initargs=(svd_scorer, user_items, n)) as pool:
+            results = pool.map(_top_n_chunk, [users[rows].tolist() for rows in chunks])
+            for rows, (chunk_items, chunk_scores) in zip(chunks, results):
+                items[rows] = chunk_items
+                scores[rows] = chunk_scores
+
+    arrays = {
+        'users': users.astype(str) if users.dtype == object else users,
+        'items': items,
+        'scores': scores,
+        'fingerprints': fingerprints,
+    }
+    replacements = []
+    for name, array in arrays.items():
+        path = os.path.join(out_dir, f"{COLLABORATIVE_TOP_N}_{name}.npy")
+        np.save(path + '.tmp.npy', array)
+        replacements.append((path + '.tmp.npy', path))
+    meta = {
+        'model_version': model.version,
+        'items_digest': digest,
+        'n_users': len(users),
+        'n': n,
+        'rescored_users': len(stale_rows),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    _publish(meta_path, replacements, meta)
+    logger.info(f"Materialized top {n} for {len(users)} users ({len(stale_rows)} rescored) "
+                f"in {time.perf_counter() - start:.2f}s")
+    return meta
+
+if __name__ == '__main__':
+    import argparse
+    from artifacts import resolve_artifact_dir
+    from spotify_model import SpotifyModel
+
+    parser = argparse.ArgumentParser(description="Precompute recommendation tables")
+    parser.add_argument('table', choices=['content', 'collaborative'])
+    parser.add_argument('--artifact-dir', default=None,
+                        help="load this artifact bundle and write the tables into it")
+    parser.add_argument('--out', default=None, help="defaults to the bundle, or precomputed/")
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--n', type=int, default=200, help="collaborative items per user")
+    parser.add_argument('--full', action='store_true', help="rescore every user")
+    parser.add_argument('--chunk-size', type=int, default=2048)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    out_dir = args.out
+    if out_dir is None:
+        out_dir = resolve_artifact_dir(args.artifact_dir) if args.artifact_dir else 'precomputed'
+    model = SpotifyModel(artifact_dir=args.artifact_dir, lazy=True)
+    if args.table == 'content':
+        build_content_neighbours(model, out_dir, k=args.k, chunk_size=args.chunk_size, workers=args.workers)
+    else:
+        build_collaborative_top_n(model, out_dir, n=args.n, workers=args.workers, incremental=not args.full)
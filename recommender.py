@@ -1,28 +1,178 @@
 import re
 import logging
+import functools
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
+from spotify_client import fetch_track_data
+from spotify_model import FEATURE_COLS
+from precompute import items_digest
+from content_index import candidate_distances
+from fusion import HybridFusion
+from metrics import NULL_METRICS
 
 logger = logging.getLogger(__name__)
 
 
+def _timed(name, **labels):
+    # Times every call of the method into self.metrics
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(name, **labels):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 class Recommender:
-    def __init__(self, spotify_model, spotify_client, cache):
+    def __init__(self, spotify_model, spotify_client, cache, fetcher=None, metrics=None,
+                 result_cache=None, fusion=None):
         self.model = spotify_model
         self.spotify = spotify_client
         self.cache = cache
+        self.fetcher = fetcher
+        # Finished recommendation lists (ResultCache); None computes every call
+        self.result_cache = result_cache
+        # Candidate pools, weights and normalization of hybrid recommendations
+        self.fusion = fusion or HybridFusion()
+        # Per-stage latency histograms and counters; no-ops unless a Metrics is given
+        self.metrics = metrics or NULL_METRICS
         self.data_cleaned = spotify_model.data_cleaned
-        self.new_df = spotify_model.new_df
         self.nn_model = spotify_model.nn_model_content
-        self.svd_model = spotify_model.svd
+        self.content_index = spotify_model.content_index
         self.data_content_scaled = spotify_model.data_content_scaled
 
         # Validate required models
-        if self.svd_model is None:
+        if not spotify_model.collaborative_ready.is_set():
+            logger.info("Collaborative model is still loading. Using content-based recommendations until it is ready.")
+        elif self.svd_scorer is None:
             logger.warning("SVD model is not available. Collaborative filtering will be disabled.")
-        if self.nn_model is None:
+        if self.nn_model is None or self.content_index is None:
             raise ValueError("Content-based model is not available. System cannot function.")
 
+        self._build_catalog_index()
+        self._item_keys = (None, None, None)
+        self._top_n_table = (None, None)
+
+    # Collaborative components are read from the model on every call, so a
+    # model that is still loading them in the background is picked up once ready
+    @property
+    def new_df(self):
+        return self.model.new_df
+
+    @property
+    def svd_model(self):
+        return self.model.svd
+
+    @property
+    def svd_scorer(self):
+        return self.model.svd_scorer
+
+    @property
+    def user_items(self):
+        return self.model.user_items
+
+    def collaborative_ready(self):
+        return self.model.collaborative_ready.is_set()
+
+    def _collaborative_components(self):
+        # (svd_scorer, user_items) when collaborative filtering can run, else None
+        if not self.collaborative_ready():
+            logger.info("Collaborative model still loading, returning empty collaborative recommendations")
+            return None
+        _, user_items, svd_scorer = self.model.collaborative_snapshot()
+        if svd_scorer is None:
+            logger.warning("SVD model not available, returning empty collaborative recommendations")
+            return None
+        return svd_scorer, user_items
+
+    def _item_keys_for(self, svd_scorer):
+        # Collaborative items keyed by catalog row, or -(item position + 1)
+        # for tracks only known from the user matrix, and the reverse map of
+        # catalog rows to item positions (-1 if unrated). Cached per item
+        # list, which online updates keep unless they add items.
+        keyed_items, item_keys, catalog_positions = self._item_keys
+        if keyed_items is not svd_scorer.item_ids:
+            item_keys = np.array([
+                self.track_index.get(tid, -(pos + 1))
+                for pos, tid in enumerate(svd_scorer.item_ids)
+            ], dtype=np.int64)
+            item_keys[item_keys >= 0] = self.canonical_rows[item_keys[item_keys >= 0]]
+            catalog_positions = np.full(len(self.data_cleaned), -1, dtype=np.int64)
+            in_catalog = np.flatnonzero(item_keys >= 0)
+            catalog_positions[item_keys[in_catalog]] = in_catalog
+            self._item_keys = (svd_scorer.item_ids, item_keys, catalog_positions)
+        return item_keys, catalog_positions
+
+    def _top_n_table_for(self, svd_scorer):
+        # The materialized table, if its item positions match this scorer's items
+        checked_items, table = self._top_n_table
+        if checked_items is not svd_scorer.item_ids:
+            table = self.model.collaborative_top_n
+            if table is not None and table.meta['items_digest'] != items_digest(svd_scorer.item_ids):
+                logger.warning("Collaborative top-N table was built for other items; scoring live")
+                table = None
+            self._top_n_table = (svd_scorer.item_ids, table)
+        return table
+
+    def _cached(self, key, top_n, validator, compute, prefix=False):
+        # compute() through the result cache; validator None skips caching
+        if self.result_cache is None or validator is None:
+            return compute()
+        result = self.result_cache.get(key, top_n, validator, prefix=prefix)
+        if result is None:
+            result = compute()
+            self.result_cache.put(key, top_n, result, validator, prefix=prefix)
+        return result
+
+    def _user_validator(self, user_id):
+        # What a user's collaborative results depend on; None while they
+        # can't be computed, so empty fallbacks aren't cached
+        if not self.collaborative_ready():
+            return None
+        _, user_items, svd_scorer = self.model.collaborative_snapshot()
+        if svd_scorer is None:
+            return None
+        return self.model.version, user_items.fingerprint(user_id), len(svd_scorer.item_ids)
+
+    def add_ratings(self, user_id, ratings, n_epochs=5):
+        # Online update (SpotifyModel.add_ratings) plus dropping the user's cached results
+        self.model.add_ratings(user_id, ratings, n_epochs=n_epochs)
+        if self.result_cache is not None:
+            self.result_cache.invalidate_user(user_id)
+
+    def _build_catalog_index(self):
+        # Built once so lookups don't rebuild dicts or scan data_cleaned per request
+        catalog = self.data_cleaned
+        self.track_index = {track: idx for idx, track in enumerate(catalog['track_id'])}
+        # A track listed under several genres has several rows; hybrid
+        # candidates are keyed by its first row so each track appears once
+        codes, _ = pd.factorize(catalog['track_id'])
+        _, first_rows = np.unique(codes, return_index=True)
+        self.canonical_rows = first_rows[codes].astype(np.int64) if len(codes) else np.empty(0, np.int64)
+        self.track_ids = self._catalog_column('track_id')
+        self.track_names = self._catalog_column('track_name')
+        self.track_artists = self._catalog_column('artists')
+        self.track_genres = self._catalog_column('track_genre')
+
+    def _catalog_column(self, column):
+        if column in self.data_cleaned:
+            values = self.data_cleaned[column]
+            # Compact models keep categorical columns encoded
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                return values.array
+            return values.to_numpy(dtype=object)
+        return np.full(len(self.data_cleaned), 'Unknown', dtype=object)
+
+    def _catalog_track_info(self, idx):
+        return {
+            'track_id': self.track_ids[idx],
+            'track_name': self.track_names[idx],
+            'artists': self.track_artists[idx],
+            'track_genre': self.track_genres[idx],
+        }
+
     def extract_track_id_from_url(self, url):
         pattern = r"track/([a-zA-Z0-9]+)"
         match = re.search(pattern, url)
@@ -31,160 +181,259 @@ class Recommender:
         raise ValueError("Invalid Spotify track URL.")
 
     def get_track_features(self, track_id):
-        cached_data = self.cache.get(track_id)
-        if cached_data:
-            logger.info(f"Cache hit for track_id: {track_id}")
-            return cached_data
-            
-        try:
-            track_info = self.spotify.track(track_id)
-            audio_features = self.spotify.audio_features([track_id])[0]
-            
-            track_data = {
-                'track_id': track_info['id'],
-                'track_name': track_info['name'],
-                'artists': ', '.join([artist['name'] for artist in track_info['artists']]),
-                'track_genre': 'Unknown',
-                'popularity': track_info['popularity'],
-                'danceability': audio_features.get('danceability', 0),
-                'energy': audio_features.get('energy', 0),
-                'acousticness': audio_features.get('acousticness', 0),
-                'instrumentalness': audio_features.get('instrumentalness', 0),
-                'liveness': audio_features.get('liveness', 0),
-                'valence': audio_features.get('valence', 0),
-                'tempo': audio_features.get('tempo', 0),
-            }
-            
-            self.cache.set(track_id, track_data)
-            return track_data
-            
-        except Exception as e:
-            if "403" in str(e):
-                raise ValueError("Spotify API returned 403: Access to this track is forbidden.")
-            raise ValueError(f"Error fetching track data: {str(e)}")
+        track_data = self.get_track_features_many([track_id]).get(track_id)
+        if track_data is None:
+            raise ValueError(f"Error fetching track data: track {track_id} not found")
+        return track_data
+
+    @_timed('stage_seconds', stage='track_fetch')
+    def get_track_features_many(self, track_ids):
+        # Bulk cache read, then chunked Spotify calls for the misses only
+        if not track_ids:
+            return {}
+        if self.fetcher is not None:
+            return self.fetcher.get_tracks(track_ids)
+        track_ids = list(dict.fromkeys(track_ids))
+        found = self.cache.get_many(track_ids)
+        if found:
+            logger.info(f"Cache hit for {len(found)} of {len(track_ids)} tracks")
+
+        misses = [track_id for track_id in track_ids if track_id not in found]
+        if misses:
+            fetched = fetch_track_data(self.spotify, misses, metrics=self.metrics)
+            if fetched:
+                self.cache.set_many(fetched)
+            found.update(fetched)
+        return found
+
+    def _scaled_vectors(self, track_data):
+        # Prepare a DataFrame with one row per track for scaling
+        new_rows = pd.DataFrame([{col: data.get(col, 0) for col in FEATURE_COLS} for data in track_data])
+        return self.model.scaler.transform(new_rows).astype(self.data_content_scaled.dtype)
 
+    @_timed('stage_seconds', stage='content_search')
+    def _content_neighbours(self, seed_idx, query_vectors, k):
+        # Catalog seeds read the precomputed neighbour table; off-catalog
+        # seeds (seed_idx -1) and k beyond the table go to live search
+        table = self.model.content_neighbours
+        in_catalog = seed_idx >= 0
+        if table is None or k > table.k or not in_catalog.any():
+            self.metrics.increment('content_lookups', len(seed_idx), source='search')
+            return self.content_index.query(query_vectors, k)
+        self.metrics.increment('content_lookups', int(in_catalog.sum()), source='table')
+        distances = np.empty((len(seed_idx), k))
+        indices = np.empty((len(seed_idx), k), dtype=np.int64)
+        distances[in_catalog], indices[in_catalog] = table.lookup(seed_idx[in_catalog], k)
+        if not in_catalog.all():
+            self.metrics.increment('content_lookups', int((~in_catalog).sum()), source='search')
+            distances[~in_catalog], indices[~in_catalog] = self.content_index.query(query_vectors[~in_catalog], k)
+        return distances, indices
+
+    @_timed('request_seconds', method='content')
     def get_content_based_recommendations(self, track_id, top_n=5):
+        # Neighbour lists nest, so a longer cached list serves any shorter one
+        return self._cached(('content', None, track_id), top_n, (self.model.version,),
+                            lambda: self._content_based_recommendations(track_id, top_n), prefix=True)
+
+    def _content_based_recommendations(self, track_id, top_n):
         scaled_features = self.data_content_scaled
-        track_index_map = {track: idx for idx, track in enumerate(self.data_cleaned['track_id'])}
-        
-        if track_id not in track_index_map:
+        track_idx = self.track_index.get(track_id)
+
+        if track_idx is None:
             # Fetch track data from Spotify API if not in dataset
-            new_track_data = self.get_track_features(track_id)
-            # Prepare a single-row DataFrame for scaling
-            feature_cols = ['popularity','danceability','energy','acousticness',
-                            'instrumentalness','liveness','valence','tempo']
-            new_row = pd.DataFrame([{col: new_track_data.get(col, 0) for col in feature_cols}])
-            query_vector = self.model.scaler.transform(new_row)
+            query_vector = self._scaled_vectors([self.get_track_features(track_id)])
         else:
-            track_idx = track_index_map[track_id]
             query_vector = scaled_features[track_idx].reshape(1, -1)
     
-        distances, indices = self.nn_model.kneighbors(query_vector, n_neighbors=top_n + 1)
+        seed_idx = np.array([-1 if track_idx is None else track_idx])
+        distances, indices = self._content_neighbours(seed_idx, query_vector, top_n + 1)
     
         recommendations = []
         for i, idx in enumerate(indices[0]):
             # If this was a dataset track, skip if it’s the same
-            if track_id in track_index_map and idx == track_index_map[track_id]:
+            if idx == track_idx:
                 continue
-            
-            track_info = self.data_cleaned.iloc[idx]
-            recommendations.append({
-                'track_id': track_info['track_id'],
-                'track_name': track_info.get('track_name', 'Unknown'),
-                'artists': track_info.get('artists', 'Unknown'),
-                'track_genre': track_info.get('track_genre', 'Unknown'),
-                'similarity_score': 1 - distances[0][i]
-            })
+
+            track_info = self._catalog_track_info(idx)
+            track_info['similarity_score'] = 1 - distances[0][i]
+            recommendations.append(track_info)
             if len(recommendations) >= top_n:
                 break
 
         return recommendations
 
+    @_timed('request_seconds', method='collaborative')
     def get_collaborative_recommendations(self, user_id, top_n=10):
+        return self._cached(('collaborative', user_id), top_n, self._user_validator(user_id),
+                            lambda: self._collaborative_recommendations(user_id, top_n), prefix=True)
+
+    def _collaborative_recommendations(self, user_id, top_n):
         # Check if SVD model is available
-        if self.svd_model is None:
-            logger.warning("SVD model not available, returning empty collaborative recommendations")
+        components = self._collaborative_components()
+        if components is None:
             return []
+        svd_scorer, user_items = components
+        item_ids = svd_scorer.item_ids
 
-        all_track_ids = set(self.new_df['track_id'].unique())
-        rated_track_ids = set(self.new_df[self.new_df['user_id'] == user_id]['track_id'].unique())
-        unrated_track_ids = list(all_track_ids - rated_track_ids)
-
-        predictions = []
-        for track_id in unrated_track_ids:
-            try:
-                pred = self.svd_model.predict(user_id, track_id).est
-                predictions.append((track_id, pred))
-            except Exception as e:
-                logger.error(f"Error predicting for track {track_id}: {str(e)}")
-                continue
+        # Materialized rows are used unless the user rated something since the build
+        table = self._top_n_table_for(svd_scorer)
+        if table is not None and top_n <= table.n:
+            with self.metrics.timer('stage_seconds', stage='collaborative_table'):
+                row = table.row(user_id, user_items.fingerprint(user_id))
+                if row is not None:
+                    items = table.items[row, :top_n]
+                    scores = table.scores[row, :top_n]
+                    return [(item_ids[i], float(score)) for i, score in zip(items, scores) if i >= 0]
+
+        with self.metrics.timer('stage_seconds', stage='svd_scoring'):
+            scores = svd_scorer.user_scores(user_id)
+            rated = user_items.exclusion_mask(user_id)
 
-        return sorted(predictions, key=lambda x: x[1], reverse=True)[:top_n]
+            top = svd_scorer.top_n(scores, top_n, exclude=rated)
+        return [(item_ids[i], float(scores[i])) for i in top]
 
+    @_timed('request_seconds', method='hybrid')
     def get_hybrid_recommendations(self, user_id, track_id, top_n=10):
-        # Get content-based recommendations
-        content_recommendations = self.get_content_based_recommendations(track_id, top_n)
-        content_scores = {
-            rec['track_id']: rec['similarity_score'] for rec in content_recommendations
-        }
+        # The same pipeline as recommend_many, for one pair. Candidate pools
+        # don't grow with top_n below their size, so fused lists nest.
+        return self._cached(('hybrid', user_id, track_id, *self.fusion.key(top_n)), top_n,
+                            self._user_validator(user_id),
+                            lambda: self._recommend_chunk([(user_id, track_id)], top_n)[0], prefix=True)
 
-        # Get collaborative filtering recommendations (with fallback)
-        collaborative_recommendations = self.get_collaborative_recommendations(user_id, top_n * 2)
-        collaborative_scores = {
-            rec[0]: rec[1] for rec in collaborative_recommendations
-        }
+    @_timed('request_seconds', method='batch')
+    def recommend_many(self, pairs, top_n=10, chunk_size=64):
+        # Hybrid recommendations for many (user_id, track_id) pairs. chunk_size
+        # bounds the (chunk x items) collaborative score matrix held in memory.
+        pairs = list(pairs)
+        results = []
+        for start in range(0, len(pairs), chunk_size):
+            results.extend(self._recommend_chunk(pairs[start:start + chunk_size], top_n))
+        return results
+
+    def _seed_vectors(self, track_ids):
+        # Catalog rows (-1 off catalog) and scaled feature vectors of the seeds
+        seed_idx = np.array([self.track_index.get(tid, -1) for tid in track_ids], dtype=np.int64)
+        query_vectors = np.empty((len(track_ids), self.data_content_scaled.shape[1]),
+                                 dtype=self.data_content_scaled.dtype)
+        in_catalog = seed_idx >= 0
+        query_vectors[in_catalog] = self.data_content_scaled[seed_idx[in_catalog]]
+        if not in_catalog.all():
+            # Fetch track data from Spotify API for seeds not in dataset
+            off_catalog_seeds = [tid for tid, known in zip(track_ids, in_catalog) if not known]
+            seed_data = self.get_track_features_many(off_catalog_seeds)
+            for tid in off_catalog_seeds:
+                if tid not in seed_data:
+                    raise ValueError(f"Error fetching track data: track {tid} not found")
+            query_vectors[~in_catalog] = self._scaled_vectors([seed_data[tid] for tid in off_catalog_seeds])
+        return seed_idx, query_vectors
+
+    def _collaborative_candidates(self, user_ids, svd_scorer, user_items, pool):
+        # Each user's best `pool` item positions (-1 padded) and their mask.
+        # Materialized rows serve users whose ratings are unchanged.
+        positions = np.full((len(user_ids), pool), -1, dtype=np.int64)
+        live = np.ones(len(user_ids), dtype=bool)
+        table = self._top_n_table_for(svd_scorer)
+        if table is not None and pool <= table.n:
+            with self.metrics.timer('stage_seconds', stage='collaborative_table'):
+                for row, user_id in enumerate(user_ids):
+                    table_row = table.row(user_id, user_items.fingerprint(user_id))
+                    if table_row is not None:
+                        positions[row] = table.items[table_row, :pool]
+                        live[row] = False
+        if live.any():
+            with self.metrics.timer('stage_seconds', stage='svd_scoring'):
+                live_users = [user_id for user_id, is_live in zip(user_ids, live) if is_live]
+                scores = svd_scorer.user_scores_many(live_users)
+                top, valid = svd_scorer.top_n_many(scores, pool, exclude=user_items.exclusion_masks(live_users))
+                positions[live, :top.shape[1]] = np.where(valid, top, -1)
+        return positions, positions >= 0
 
-        # Adjust weights based on available models
-        content_weight = 0.6
-        collaborative_weight = 0.4
-        if not collaborative_scores:
-            content_weight = 1.0
-            collaborative_weight = 0.0
-            logger.info("Using content-based recommendations only")
-
-        # Combine recommendations
-        track_ids = set(content_scores.keys()).union(set(collaborative_scores.keys()))
-        max_content = max(content_scores.values()) if content_scores else 1
-        max_collaborative = max(collaborative_scores.values()) if collaborative_scores else 1
-
-        combined_recommendations = []
-        for tid in track_ids:
-            content_score = content_scores.get(tid, 0) / max_content
-            collaborative_score = collaborative_scores.get(tid, 0) / max_collaborative
-            final_score = 0.6 * content_score + 0.4 * collaborative_score
-            
-            # Fallback if track is not in the dataset
-            track_rows = self.data_cleaned[self.data_cleaned['track_id'] == tid]
-            if track_rows.empty:
-                sp_data = self.get_track_features(tid)
-                track_info = {
-                    'track_id': sp_data['track_id'],
-                    'track_name': sp_data['track_name'],
-                    'artists': sp_data['artists'],
-                    'track_genre': sp_data['track_genre']
-                }
+    def _recommend_chunk(self, pairs, top_n):
+        user_ids = [user_id for user_id, _ in pairs]
+        track_ids = [track_id for _, track_id in pairs]
+        content_pool, collaborative_pool = self.fusion.pools(top_n)
+
+        # Candidate generation: content neighbours of each seed ...
+        seed_idx, query_vectors = self._seed_vectors(track_ids)
+        _, content_keys = self._content_neighbours(seed_idx, query_vectors, content_pool + 1)
+        # Keyed by canonical row, which also drops the seed's other rows
+        content_keys = np.where(content_keys >= 0, self.canonical_rows[np.maximum(content_keys, 0)], -1)
+        seed_keys = np.where(seed_idx >= 0, self.canonical_rows[np.maximum(seed_idx, 0)], -1)
+        content_valid = (content_keys >= 0) & (content_keys != seed_keys[:, None])
+        content_valid &= np.cumsum(content_valid, axis=1) <= content_pool
+
+        # ... and each user's best SVD items, keyed like catalog rows
+        components = self._collaborative_components()
+        if components is not None:
+            svd_scorer, user_items = components
+            item_keys, catalog_positions = self._item_keys_for(svd_scorer)
+            positions, collaborative_valid = self._collaborative_candidates(
+                user_ids, svd_scorer, user_items, collaborative_pool)
+            collaborative_keys = item_keys[np.maximum(positions, 0)]
+        else:
+            svd_scorer = None
+            collaborative_keys = np.empty((len(pairs), 0), dtype=np.int64)
+            collaborative_valid = np.empty((len(pairs), 0), dtype=bool)
+
+        with self.metrics.timer('stage_seconds', stage='fusion'):
+            keys, valid = self.fusion.merge(content_keys, content_valid, collaborative_keys, collaborative_valid)
+
+            # Re-rank: every candidate is scored on both signals. Tracks
+            # outside the catalog have no content features.
+            in_catalog = valid & (keys >= 0)
+            rows = np.where(in_catalog, keys, 0)
+            content_scores = np.where(in_catalog, 1 - candidate_distances(
+                query_vectors, self.data_content_scaled[rows], self.content_index.metric,
+                self.content_index.metric_params), np.nan)
+            if svd_scorer is not None:
+                candidate_positions = np.where(keys >= 0, catalog_positions[rows], -keys - 1)
+                collaborative_scores = svd_scorer.scores_at(user_ids, np.where(valid, candidate_positions, -1))
             else:
-                track_info = track_rows.iloc[0]
-
-            combined_recommendations.append({
-                'track_id': tid,
-                'track_name': track_info.get('track_name', 'Unknown'),
-                'artists': track_info.get('artists', 'Unknown'),
-                'track_genre': track_info.get('track_genre', 'Unknown'),
-                'content_score': content_score,
-                'collaborative_score': collaborative_score,
-                'final_score': final_score
-            })
-
-        # Sort and remove duplicates
-        combined_recommendations.sort(key=lambda x: x['final_score'], reverse=True)
-        unique_recommendations = {}
-        for rec in combined_recommendations:
-            if rec['track_id'] not in unique_recommendations:
-                unique_recommendations[rec['track_id']] = rec
-            if len(unique_recommendations) >= top_n:
-                break
+                collaborative_scores = np.full(keys.shape, np.nan)
+            content_part, collaborative_part, final = self.fusion.fuse(
+                content_scores, collaborative_scores, valid, with_collaborative=svd_scorer is not None)
+            ranked = np.argsort(-final, axis=1, kind='stable')[:, :top_n]
 
-        return list(unique_recommendations.values())
+        # Only off-catalog tracks that made the cut need Spotify metadata
+        returned_keys = np.take_along_axis(keys, ranked, axis=1)
+        returned = np.take_along_axis(valid, ranked, axis=1) & (returned_keys < 0)
+        off_catalog_keys = np.unique(returned_keys[returned])
+        off_catalog_ids = [svd_scorer.item_ids[-key - 1] for key in off_catalog_keys]
+        fetched = self.get_track_features_many(off_catalog_ids)
+        off_catalog = {
+            key: self._fetched_track_info(tid, fetched.get(tid))
+            for key, tid in zip(off_catalog_keys, off_catalog_ids)
+        }
+
+        with self.metrics.timer('stage_seconds', stage='metadata_join'):
+            results = []
+            for row in range(len(pairs)):
+                recommendations = []
+                for slot in ranked[row]:
+                    if not valid[row, slot]:
+                        break
+                    key = keys[row, slot]
+                    track_info = dict(off_catalog[key]) if key < 0 else self._catalog_track_info(key)
+                    track_info['content_score'] = float(content_part[row, slot])
+                    track_info['collaborative_score'] = float(collaborative_part[row, slot])
+                    track_info['final_score'] = float(final[row, slot])
+                    recommendations.append(track_info)
+                results.append(recommendations)
 
+        return results
 
+    @staticmethod
+    def _fetched_track_info(track_id, sp_data):
+        if sp_data is None:
+            return {
+                'track_id': track_id,
+                'track_name': 'Unknown',
+                'artists': 'Unknown',
+                'track_genre': 'Unknown',
+            }
+        return {
+            'track_id': sp_data['track_id'],
+            'track_name': sp_data['track_name'],
+            'artists': sp_data['artists'],
+            'track_genre': sp_data['track_genre'],
+        }
@@ -0,0 +1,111 @@
+import threading
+import logging
+from collections import namedtuple
+
+from cachetools import LRUCache
+
+from metrics import NULL_METRICS
+
+logger = logging.getLogger(__name__)
+
+# top_n the result was computed for, the result, and the state it depends on
+_Entry = namedtuple('_Entry', ['top_n', 'result', 'validator'])
+
+
+class _ResultLRU(LRUCache):
+    # Entries are sized by recommendation count; evictions are reported so
+    # the per-user key index doesn't keep keys that are gone
+    def __init__(self, maxsize, on_evict):
+        super().__init__(maxsize=maxsize, getsizeof=lambda entry: len(entry.result) + 1)
+        self.on_evict = on_evict
+        self.evictions = 0
+
+    def popitem(self):
+        key, entry = super().popitem()
+        self.evictions += 1
+        self.on_evict(key)
+        return key, entry
+
+
+class ResultCache:
+    """LRU cache of recommendation lists, bounded by total recommendations held.
+
+    Keys are ``(method, user_id, *inputs)``, with user_id None for methods
+    that don't depend on the user. Each entry carries a validator, e.g. the
+    model version and the user's ratings fingerprint, and is only served
+    while the caller's current validator matches, so a user's entries lapse
+    as soon as their ratings change. ``invalidate_user`` drops them eagerly.
+
+    With ``prefix=True`` a list computed for a larger top_n answers any
+    smaller one by truncation, and the largest list seen is kept.
+    """
+
+    def __init__(self, maxsize=100_000, metrics=None):
+        self.metrics = metrics or NULL_METRICS
+        self._lock = threading.Lock()
+        self._entries = _ResultLRU(maxsize, self._forget)
+        self._user_keys = {}
+        self._counts = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def get(self, key, top_n, validator, prefix=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                result = 'miss'
+            elif entry.validator != validator:
+                result = 'stale'
+            elif entry.top_n == top_n or (prefix and (top_n < entry.top_n or len(entry.result) < entry.top_n)):
+                # A list shorter than asked for is complete, so larger top_n get it too
+                result = 'hit'
+            else:
+                result = 'miss'
+            self._counts['hits' if result == 'hit' else 'misses' if result == 'miss' else 'stale'] += 1
+        self.metrics.increment('cache_requests', tier='result', result=result)
+        if result != 'hit':
+            return None
+        return _copy(entry.result[:top_n])
+
+    def put(self, key, top_n, result, validator, prefix=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if (prefix and entry is not None and entry.validator == validator
+                    and entry.top_n >= top_n):
+                return
+            try:
+                self._entries[key] = _Entry(top_n, _copy(result), validator)
+            except ValueError:
+                # Larger than the whole cache
+                return
+            if key[1] is not None:
+                self._user_keys.setdefault(key[1], set()).add(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = self._user_keys.pop(user_id, ())
+            for key in keys:
+                self._entries.pop(key, None)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _forget(self, key):
+        # Called under the lock on LRU eviction
+        keys = self._user_keys.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[1]]
+
+    def stats(self):
+        with self._lock:
+            return {**self._counts, 'evictions': self._entries.evictions,
+                    'entries': len(self._entries), 'size': self._entries.currsize,
+                    'maxsize': self._entries.maxsize}
+
+
+def _copy(result):
+    # Callers get their own recommendation dicts, so edits can't reach the cache
+    return [dict(rec) if isinstance(rec, dict) else rec for rec in result]
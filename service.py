@@ -0,0 +1,412 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_PAIRS = 1000
+# Seconds between a worker's checks for a newer version of shared arrays
+SHARED_CHECK_INTERVAL = 5.0
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Per-process recommender, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(model_params, cache_file, ratings_log=None, drift_interval=None):
+    # Imported here so the front end process stays light
+    from cache import SQLiteCache
+    from ingest import RatingsIngester
+    from recommender import Recommender
+    from result_cache import ResultCache
+    from spotify_client import initialize_spotify_client
+    from spotify_fetcher import SpotifyFetcher
+    from spotify_model import SpotifyModel
+
+    # The front end handles shutdown; Ctrl-C reaches the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    start = time.perf_counter()
+    model = SpotifyModel(**model_params)
+    model.wait_for_collaborative()
+    spotify_client = initialize_spotify_client()
+    # SQLite rather than shelve: every worker shares the one cache file
+    cache = SQLiteCache(db_file=cache_file)
+    fetcher = SpotifyFetcher(spotify_client, cache)
+    recommender = Recommender(model, spotify_client, cache, fetcher=fetcher, result_cache=ResultCache())
+    for stop in ('ingest_stop', 'drift_stop'):
+        if stop in _worker:
+            _worker.pop(stop).set()
+    if 'recommender' in _worker:
+        # Re-attaching: release the replaced model's fetcher threads and
+        # cache connection
+        previous = _worker.pop('recommender')
+        previous.fetcher.close()
+        previous.cache.close()
+    if ratings_log is not None:
+        # Each worker applies the log to its own model; a re-attached model
+        # starts again from the beginning of the log
+        ingester = RatingsIngester(model, result_cache=recommender.result_cache)
+        _worker['ingest_stop'] = ingester.start_follow(ratings_log)
+        if drift_interval:
+            # Online fold-ins drift from a full retrain; check how far
+            _worker['drift_stop'] = model.start_drift_monitor(drift_interval)
+    _worker.update(recommender=recommender, model_params=model_params, cache_file=cache_file,
+                   ratings_log=ratings_log, drift_interval=drift_interval, checked_at=time.monotonic())
+    logger.info(f"Worker {os.getpid()} loaded model {model.version} in {time.perf_counter() - start:.2f}s")
+
+
+def _reattach_if_stale():
+    # Pick up a newly published version of the shared arrays
+    model = _worker['recommender'].model
+    if model.shared is None or time.monotonic() - _worker['checked_at'] < SHARED_CHECK_INTERVAL:
+        return
+    _worker['checked_at'] = time.monotonic()
+    if model.shared.stale():
+        _init_worker(_worker['model_params'], _worker['cache_file'], _worker['ratings_log'],
+                     _worker['drift_interval'])
+
+
+def _ping():
+    return os.getpid()
+
+
+def _worker_memory():
+    from shared_arrays import process_memory
+    model = _worker['recommender'].model
+    return os.getpid(), {'model_version': model.version,
+                         'shared_version': model.shared.version if model.shared else None,
+                         'drift': model.drift,
+                         **process_memory()}
+
+
+def _recommend(method, params):
+    # Runs in a worker; returns (status, body, seconds spent scoring)
+    _reattach_if_stale()
+    recommender = _worker['recommender']
+    start = time.perf_counter()
+    try:
+        top_n = params.get('top_n', 10)
+        if method == 'content':
+            result = recommender.get_content_based_recommendations(params['track_id'], top_n)
+        elif method == 'collaborative':
+            result = [{'track_id': track_id, 'score': score} for track_id, score in
+                      recommender.get_collaborative_recommendations(params['user_id'], top_n)]
+        elif method == 'hybrid':
+            result = recommender.get_hybrid_recommendations(params['user_id'], params['track_id'], top_n)
+        else:
+            result = recommender.recommend_many([(pair['user_id'], pair['track_id'])
+                                                 for pair in params['pairs']], top_n)
+        status, body = HTTPStatus.OK, {'recommendations': result}
+    except ValueError as e:
+        status, body = HTTPStatus.UNPROCESSABLE_ENTITY, {'error': str(e)}
+    except LookupError as e:
+        status, body = HTTPStatus.NOT_FOUND, {'error': f"Not found: {e}"}
+    except TypeError as e:
+        status, body = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+    return status, body, time.perf_counter() - start
+
+
+def _json_default(value):
+    # numpy scalars and categorical values in recommendation dicts
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _validate(method, params):
+    # Checked in the front end so bad requests never occupy a worker
+    if not isinstance(params, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+    required = {'content': ('track_id',), 'collaborative': ('user_id',),
+                'hybrid': ('user_id', 'track_id'), 'batch': ('pairs',)}[method]
+    missing = [name for name in required if name not in params]
+    if missing:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Missing fields: {', '.join(missing)}")
+    top_n = params.get('top_n', 10)
+    if not _is_int(top_n) or not 1 <= top_n <= 100:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "top_n must be an integer from 1 to 100")
+    if method == 'batch':
+        pairs = params['pairs']
+        if (not isinstance(pairs, list) or len(pairs) > MAX_BATCH_PAIRS
+                or not all(isinstance(pair, dict) and 'user_id' in pair and 'track_id' in pair
+                           for pair in pairs)):
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               f"pairs must be a list of up to {MAX_BATCH_PAIRS} "
+                               f"{{user_id, track_id}} objects")
+        for index, pair in enumerate(pairs):
+            _validate_ids(pair, f"pairs[{index}].")
+    else:
+        _validate_ids(params)
+
+
+def _is_int(value):
+    # bool is an int subclass, but true/false aren't ids or counts
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate_ids(params, prefix=''):
+    if 'user_id' in params and not _is_int(params['user_id']):
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"{prefix}user_id must be an integer")
+    if 'track_id' in params and not isinstance(params['track_id'], str):
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"{prefix}track_id must be a string")
+
+
+async def _read_line(reader):
+    # readline() raises ValueError for a line past the stream limit
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Request line too long")
+
+
+class RecommendationService:
+    """HTTP/JSON front end over a pool of recommender worker processes.
+
+    The asyncio loop only parses requests and writes responses; scoring
+    runs in ``workers`` processes that each load the model once. At most
+    ``max_pending`` requests wait for a worker, beyond that the service
+    answers 503 rather than queueing without bound.
+
+    Routes: ``POST /recommend/{content,collaborative,hybrid,batch}`` with a
+    JSON body, ``GET /health``, ``GET /metrics`` (Prometheus text) and
+    ``GET /workers`` (memory per worker process).
+
+    With ``shared`` set, workers attach to model arrays published in shared
+    memory under that name instead of each loading their own copy. If
+    nothing is published yet, the service loads the model once and
+    publishes it, and unlinks it again on close().
+
+    With ``ratings_log`` set, every worker tails that append-only CSV of
+    ``user_id,track_id,rating`` lines and applies new ratings as they arrive
+    (see ingest.RatingsIngester). ``drift_interval`` then has each worker
+    retrain SVD that often (in seconds) and record how far its online
+    updates have drifted from the retrained model, shown under
+    ``GET /workers``.
+    """
+
+    def __init__(self, workers=None, max_pending=None, model_params=None,
+                 cache_file='spotify_cache.sqlite', metrics=None, shared=None,
+                 shared_registry='shared', ratings_log=None, drift_interval=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 16
+        self.model_params = model_params or {}
+        self.cache_file = cache_file
+        self.metrics = metrics or Metrics(namespace='recommendation_service')
+        self.shared = shared
+        self.shared_registry = shared_registry
+        self.ratings_log = ratings_log
+        self.drift_interval = drift_interval
+        self._owns_shared = False
+        self._pending = 0
+        self._pool = None
+
+    def start_workers(self):
+        worker_params = self.model_params
+        if self.shared is not None:
+            from shared_arrays import current_version
+            if current_version(self.shared, self.shared_registry) is None:
+                self.publish_shared()
+                self._owns_shared = True
+            worker_params = {'shared': self.shared, 'shared_registry': self.shared_registry,
+                             'compact': self.model_params.get('compact', False),
+                             'precomputed_dir': self.model_params.get('precomputed_dir')}
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(worker_params, self.cache_file, self.ratings_log,
+                                                   self.drift_interval))
+        # Start every worker now so the first requests don't pay for model loading
+        pids = {future.result() for future in [self._pool.submit(_ping) for _ in range(self.workers * 4)]}
+        logger.info(f"{len(pids)} workers ready")
+
+    def publish_shared(self):
+        # Load the model here once and publish it; workers attach, or
+        # re-attach within SHARED_CHECK_INTERVAL when a new version replaces it
+        from spotify_model import SpotifyModel
+        model = SpotifyModel(**self.model_params)
+        manifest = model.publish_shared(self.shared, registry_dir=self.shared_registry)
+        del model
+        return manifest
+
+    def worker_memory(self):
+        # Best effort: tasks go to whichever worker is free, so ask several times
+        futures = [self._pool.submit(_worker_memory) for _ in range(self.workers * 4)]
+        return dict(future.result() for future in futures)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self._owns_shared:
+            from shared_arrays import unlink
+            unlink(self.shared, self.shared_registry)
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        if self._pool is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.start_workers)
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        logger.info(f"Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                start = time.perf_counter()
+                status, payload, content_type = await self._dispatch(method, path, body)
+                route = path if status != HTTPStatus.NOT_FOUND else 'unknown'
+                self.metrics.observe('request_seconds', time.perf_counter() - start, route=route)
+                self.metrics.increment('responses', route=route, status=int(status))
+                await self._write_response(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except RequestError as e:
+            await self._write_response(writer, e.status, {'error': str(e)}, None, False)
+        except Exception as e:
+            logger.exception(f"Error handling request: {str(e)}")
+            await self._write_response(writer, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                       {'error': "Internal server error"}, None, False)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        line = await _read_line(reader)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers = {}
+        while True:
+            line = await _read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method, urlsplit(target).path, body, keep_alive
+
+    async def _dispatch(self, method, path, body):
+        if path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'workers': self.workers, 'pending': self._pending}, None
+        if path == '/metrics':
+            return HTTPStatus.OK, self.metrics.prometheus_text(), 'text/plain; version=0.0.4'
+        if path == '/workers':
+            memory = await asyncio.get_running_loop().run_in_executor(None, self.worker_memory)
+            return HTTPStatus.OK, {'workers': memory}, None
+        if not path.startswith('/recommend/'):
+            return HTTPStatus.NOT_FOUND, {'error': f"No route {path}"}, None
+        endpoint = path[len('/recommend/'):]
+        if endpoint not in ('content', 'collaborative', 'hybrid', 'batch'):
+            return HTTPStatus.NOT_FOUND, {'error': f"No route {path}"}, None
+        if method != 'POST':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Use POST"}, None
+
+        try:
+            params = json.loads(body or b'{}')
+            _validate(endpoint, params)
+        except json.JSONDecodeError:
+            return HTTPStatus.BAD_REQUEST, {'error': "Request body is not valid JSON"}, None
+        except RequestError as e:
+            return e.status, {'error': str(e)}, None
+        if self._pending >= self.max_pending:
+            self.metrics.increment('rejected')
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Too many pending requests"}, None
+
+        self._pending += 1
+        try:
+            status, payload, seconds = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _recommend, endpoint, params)
+        except Exception as e:
+            logger.error(f"Worker failed on {endpoint}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal error"}, None
+        finally:
+            self._pending -= 1
+        self.metrics.observe('worker_seconds', seconds, method=endpoint)
+        return status, payload, None
+
+    @staticmethod
+    async def _write_response(writer, status, payload, content_type, keep_alive):
+        if isinstance(payload, str):
+            body = payload.encode()
+        else:
+            body = json.dumps(payload, default=_json_default).encode()
+            content_type = 'application/json'
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recommendation HTTP/JSON service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument('--max-pending', type=int, default=None)
+    parser.add_argument('--artifact-dir', default=None)
+    parser.add_argument('--precomputed-dir', default=None)
+    parser.add_argument('--model-dir', default=None)
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--cache-file', default='spotify_cache.sqlite')
+    parser.add_argument('--shared', default=None, metavar='NAME',
+                        help="workers attach to model arrays in shared memory under this name")
+    parser.add_argument('--shared-registry', default='shared')
+    parser.add_argument('--ratings-log', default=None,
+                        help="append-only CSV of new ratings for workers to apply as it grows")
+    parser.add_argument('--drift-interval', type=float, default=None, metavar='SECONDS',
+                        help="with --ratings-log, measure SVD drift against a full retrain this often")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Shut down (and unlink owned shared arrays) on SIGTERM as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    service = RecommendationService(
+        workers=args.workers, max_pending=args.max_pending, cache_file=args.cache_file,
+        shared=args.shared, shared_registry=args.shared_registry, ratings_log=args.ratings_log,
+        drift_interval=args.drift_interval,
+        model_params={'artifact_dir': args.artifact_dir, 'precomputed_dir': args.precomputed_dir,
+                      'model_dir': args.model_dir, 'compact': args.compact},
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
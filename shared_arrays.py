@@ -0,0 +1,214 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY = 'shared'
+
+
+def _manifest_path(registry_dir, name):
+    return os.path.join(registry_dir, f"{name}.json")
+
+
+def _segment_name(name, version, key):
+    # POSIX shared memory names are short on some platforms, so hash them
+    digest = hashlib.blake2b(f"{name}/{version}/{key}".encode(), digest_size=8).hexdigest()
+    return f"sa_{digest}"
+
+
+def _untrack(segment):
+    # Before 3.13 every process that opens a segment registers it with the
+    # resource tracker, which unlinks it when that process exits. Lifetime is
+    # managed through publish()/unlink() instead.
+    resource_tracker.unregister(segment._name, 'shared_memory')
+
+
+def read_manifest(name, registry_dir=DEFAULT_REGISTRY):
+    try:
+        with open(_manifest_path(registry_dir, name)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def current_version(name, registry_dir=DEFAULT_REGISTRY):
+    manifest = read_manifest(name, registry_dir)
+    return None if manifest is None else manifest['version']
+
+
+def publish(name, arrays, meta=None, version=None, registry_dir=DEFAULT_REGISTRY):
+    """Copy ``arrays`` into shared memory segments as ``version`` of ``name``.
+
+    The manifest in ``registry_dir`` is replaced only once every segment is
+    written, so attachers see either the old version or the new one. The
+    previous version's segments are then unlinked: processes still attached
+    to them keep their mappings until they re-attach.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    version = version or datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    previous = read_manifest(name, registry_dir)
+    if previous is not None and previous['version'] == version:
+        raise ValueError(f"Version {version} of {name} is already published")
+
+    start = time.perf_counter()
+    specs = {}
+    try:
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise TypeError(f"Array {key} has dtype object and can't be shared")
+            segment = shared_memory.SharedMemory(name=_segment_name(name, version, key), create=True,
+                                                 size=max(array.nbytes, 1))
+            _untrack(segment)
+            np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+            specs[key] = {'segment': segment.name, 'shape': list(array.shape), 'dtype': array.dtype.str}
+            segment.close()
+    except Exception:
+        _unlink_segments(specs)
+        raise
+
+    manifest = {
+        'name': name,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'publisher_pid': os.getpid(),
+        'nbytes': sum(int(np.prod(spec['shape'])) * np.dtype(spec['dtype']).itemsize
+                      for spec in specs.values()),
+        'arrays': specs,
+        'meta': meta or {},
+    }
+    path = _manifest_path(registry_dir, name)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + '.tmp', path)
+    if previous is not None:
+        _unlink_segments(previous['arrays'])
+    logger.info(f"Published {len(specs)} arrays ({manifest['nbytes'] / 2**20:.1f} MB) as {name} "
+                f"{version} in {time.perf_counter() - start:.2f}s")
+    return manifest
+
+
+def _unlink_segments(specs):
+    for spec in specs.values():
+        try:
+            segment = shared_memory.SharedMemory(name=spec['segment'])
+        except FileNotFoundError:
+            continue
+        # unlink() also drops the tracker registration that opening made
+        segment.close()
+        segment.unlink()
+
+
+def unlink(name, registry_dir=DEFAULT_REGISTRY):
+    # Remove the published version of name and its manifest
+    manifest = read_manifest(name, registry_dir)
+    if manifest is None:
+        return False
+    os.remove(_manifest_path(registry_dir, name))
+    _unlink_segments(manifest['arrays'])
+    logger.info(f"Unlinked shared arrays {name} {manifest['version']}")
+    return True
+
+
+class SharedArrays:
+    """Read-only views of one published version, without copying.
+
+    Keep this object alive as long as any of ``arrays`` is in use; the
+    segments are mapped for its lifetime.
+    """
+
+    def __init__(self, name, registry_dir=DEFAULT_REGISTRY):
+        manifest = read_manifest(name, registry_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No shared arrays named {name} in {registry_dir}")
+        self.name = name
+        self.registry_dir = registry_dir
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.meta = manifest['meta']
+        self._segments = []
+        self.arrays = {}
+        for key, spec in manifest['arrays'].items():
+            # A concurrent publish may unlink this version; the caller retries
+            segment = shared_memory.SharedMemory(name=spec['segment'])
+            _untrack(segment)
+            self._segments.append(segment)
+            array = np.ndarray(tuple(spec['shape']), np.dtype(spec['dtype']), buffer=segment.buf)
+            array.flags.writeable = False
+            self.arrays[key] = array
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+    def stale(self):
+        # True once a newer version has been published under the same name
+        return current_version(self.name, self.registry_dir) != self.version
+
+
+def is_shared(array):
+    # Whether array views mapped memory (a shared segment or a mapped file)
+    while isinstance(array, np.ndarray):
+        array = array.base
+    return isinstance(array, mmap.mmap)
+
+
+def process_memory(pid='self'):
+    """Resident memory of a process in bytes, from /proc (Linux only).
+
+    ``shared`` is resident shared memory, which every attached process
+    counts in its ``rss`` but exists once per host. ``anon`` is what the
+    process holds privately.
+    """
+    fields = {'VmRSS': 'rss', 'RssAnon': 'anon', 'RssFile': 'file', 'RssShmem': 'shared'}
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    usage[fields[key]] = int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+    return usage
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish and manage shared model arrays")
+    parser.add_argument('command', choices=['publish', 'status', 'unlink'])
+    parser.add_argument('--name', default='spotify_model')
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY)
+    parser.add_argument('--artifact-dir', default=None)
+    parser.add_argument('--model-dir', default=None)
+    parser.add_argument('--compact', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'publish':
+        from spotify_model import SpotifyModel
+        model = SpotifyModel(artifact_dir=args.artifact_dir, model_dir=args.model_dir, compact=args.compact)
+        model.publish_shared(args.name, registry_dir=args.registry)
+    elif args.command == 'unlink':
+        if not unlink(args.name, args.registry):
+            print(f"{args.name} is not published")
+    else:
+        manifest = read_manifest(args.name, args.registry)
+        if manifest is None:
+            print(f"{args.name} is not published")
+        else:
+            print(f"{args.name} {manifest['version']}, published {manifest['created_at']} "
+                  f"by pid {manifest['publisher_pid']}, {manifest['nbytes'] / 2**20:.1f} MB")
+            for key, spec in manifest['arrays'].items():
+                print(f"  {key:<22}{spec['dtype']:>6} {tuple(spec['shape'])}")
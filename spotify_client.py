@@ -1,15 +1,32 @@
+import os
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import logging
-import streamlit as st
+from metrics import NULL_METRICS
 
 logger = logging.getLogger(__name__)
 
+# Spotify Web API limits on ids per request
+TRACKS_BATCH_SIZE = 50
+AUDIO_FEATURES_BATCH_SIZE = 100
+
+def _credentials():
+    # Environment variables first, so headless processes don't need Streamlit
+    client_id = os.environ.get('SPOTIFY_CLIENT_ID')
+    client_secret = os.environ.get('SPOTIFY_CLIENT_SECRET')
+    if client_id and client_secret:
+        return client_id, client_secret
+    # Imported here so batch jobs can use the fetch helpers without Streamlit
+    import streamlit as st
+    return st.secrets["SPOTIFY_CLIENT_ID"], st.secrets["SPOTIFY_CLIENT_SECRET"]
+
+
 def initialize_spotify_client():
     try:
+        client_id, client_secret = _credentials()
         client_credentials_manager = SpotifyClientCredentials(
-            client_id=st.secrets["SPOTIFY_CLIENT_ID"],
-            client_secret=st.secrets["SPOTIFY_CLIENT_SECRET"]
+            client_id=client_id,
+            client_secret=client_secret
         )
         return spotipy.Spotify(
             client_credentials_manager=client_credentials_manager,
@@ -19,3 +36,58 @@ def initialize_spotify_client():
     except Exception as e:
         logger.error(f"Failed to initialize Spotify client: {str(e)}")
         return None
+
+
+def build_track_data(track_info, audio_features):
+    return {
+        'track_id': track_info['id'],
+        'track_name': track_info['name'],
+        'artists': ', '.join([artist['name'] for artist in track_info['artists']]),
+        'track_genre': 'Unknown',
+        'popularity': track_info['popularity'],
+        'danceability': audio_features.get('danceability', 0),
+        'energy': audio_features.get('energy', 0),
+        'acousticness': audio_features.get('acousticness', 0),
+        'instrumentalness': audio_features.get('instrumentalness', 0),
+        'liveness': audio_features.get('liveness', 0),
+        'valence': audio_features.get('valence', 0),
+        'tempo': audio_features.get('tempo', 0),
+    }
+
+
+def _call(metrics, endpoint, request, batch):
+    metrics.increment('spotify_api_calls', endpoint=endpoint)
+    with metrics.timer('spotify_request_seconds', endpoint=endpoint):
+        return request(batch)
+
+
+def fetch_track_data(spotify, track_ids, metrics=NULL_METRICS):
+    # Track data keyed by requested id, using chunked tracks/audio_features
+    # calls; ids Spotify doesn't return are left out
+    track_ids = list(dict.fromkeys(track_ids))
+    try:
+        tracks = {}
+        for start in range(0, len(track_ids), TRACKS_BATCH_SIZE):
+            batch = track_ids[start:start + TRACKS_BATCH_SIZE]
+            for track_id, track_info in zip(batch, _call(metrics, 'tracks', spotify.tracks, batch)['tracks']):
+                if track_info:
+                    tracks[track_id] = track_info
+
+        found = [track_id for track_id in track_ids if track_id in tracks]
+        features = {}
+        for start in range(0, len(found), AUDIO_FEATURES_BATCH_SIZE):
+            batch = found[start:start + AUDIO_FEATURES_BATCH_SIZE]
+            for track_id, audio_features in zip(batch, _call(metrics, 'audio_features', spotify.audio_features, batch)):
+                if audio_features:
+                    features[track_id] = audio_features
+    except Exception as e:
+        metrics.increment('spotify_api_errors')
+        if "403" in str(e):
+            raise ValueError("Spotify API returned 403: Access to this track is forbidden.")
+        raise ValueError(f"Error fetching track data: {str(e)}")
+
+    missing = len(track_ids) - len(found)
+    if missing:
+        logger.warning(f"Spotify returned no data for {missing} of {len(track_ids)} tracks")
+    return {track_id: build_track_data(tracks[track_id], features.get(track_id, {}))
+            for track_id in found}
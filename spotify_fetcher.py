@@ -0,0 +1,123 @@
+import time
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import NULL_METRICS, LatencyHistogram
+from spotify_client import TRACKS_BATCH_SIZE, fetch_track_data
+
+logger = logging.getLogger(__name__)
+
+
+class SpotifyFetcher:
+    """Shared fetch layer in front of the Spotify client and track cache.
+
+    - Requests run on a bounded thread pool.
+    - Identical in-flight track ids share one call (single-flight).
+    - Expired cache entries are returned at once and refreshed in the
+      background (stale-while-revalidate).
+    - Latency is recorded per Spotify fetch and per caller request.
+    """
+
+    def __init__(self, spotify, cache, max_workers=8, metrics=None):
+        self.spotify = spotify
+        self.cache = cache
+        self.metrics = metrics or NULL_METRICS
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spotify-fetch')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        if self.metrics.enabled:
+            # Shared with the registry so they are exported with everything else
+            self.latency = {name: self.metrics.histogram('fetcher_seconds', op=name) for name in ('fetch', 'request')}
+        else:
+            self.latency = {'fetch': LatencyHistogram(), 'request': LatencyHistogram()}
+        self.counts = {'fresh': 0, 'stale': 0, 'fetched': 0, 'coalesced': 0, 'errors': 0}
+
+    def get_track(self, track_id, timeout=None):
+        return self.get_tracks([track_id], timeout=timeout).get(track_id)
+
+    def get_tracks(self, track_ids, timeout=None):
+        # Fresh and stale cache entries return immediately; only misses wait
+        start = time.perf_counter()
+        found = {}
+        stale = []
+        misses = []
+        for track_id in dict.fromkeys(track_ids):
+            entry = self.cache.peek(track_id)
+            if entry is None:
+                misses.append(track_id)
+                continue
+            found[track_id], fresh = entry
+            if not fresh:
+                stale.append(track_id)
+        self._count(fresh=len(found) - len(stale), stale=len(stale))
+
+        if stale:
+            self._submit(stale)
+        if misses:
+            for track_id, future in self._submit(misses).items():
+                track_data = future.result(timeout=timeout)
+                if track_data is not None:
+                    found[track_id] = track_data
+        self.latency['request'].observe(time.perf_counter() - start)
+        return found
+
+    def _submit(self, track_ids):
+        # One future per id; ids already in flight join the existing call
+        futures = {}
+        to_fetch = []
+        with self._lock:
+            for track_id in track_ids:
+                future = self._inflight.get(track_id)
+                if future is None:
+                    future = Future()
+                    self._inflight[track_id] = future
+                    to_fetch.append(track_id)
+                else:
+                    self.counts['coalesced'] += 1
+                    self.metrics.increment('fetcher_tracks', outcome='coalesced')
+                futures[track_id] = future
+        for start in range(0, len(to_fetch), TRACKS_BATCH_SIZE):
+            self._pool.submit(self._load, to_fetch[start:start + TRACKS_BATCH_SIZE])
+        return futures
+
+    def _load(self, track_ids):
+        start = time.perf_counter()
+        error = None
+        fetched = {}
+        try:
+            fetched = fetch_track_data(self.spotify, track_ids, metrics=self.metrics)
+            if fetched:
+                self.cache.set_many(fetched)
+        except Exception as e:
+            logger.warning(f"Spotify fetch failed for {len(track_ids)} tracks: {e}")
+            error = e
+        self.latency['fetch'].observe(time.perf_counter() - start)
+        self._count(fetched=len(fetched), errors=int(error is not None))
+
+        with self._lock:
+            futures = [self._inflight.pop(track_id) for track_id in track_ids]
+        for track_id, future in zip(track_ids, futures):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(fetched.get(track_id))
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counts[name] += value
+        for name, value in increments.items():
+            if value:
+                self.metrics.increment('fetcher_tracks', value, outcome=name)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            'counts': counts,
+            'latency': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -1,68 +1,646 @@
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import NearestNeighbors
 import pickle
 import os
+import time
 import logging
+import threading
+from contextlib import contextmanager
+from svd_scorer import SVDScorer, score_drift, svd_params
+from user_items import UserItemIndex
+from content_index import build_content_index
+from artifacts import _id_array, _ids_by_inner, load_artifacts, resolve_artifact_dir
+from shared_arrays import DEFAULT_REGISTRY, SharedArrays, is_shared, publish
+from precompute import load_collaborative_top_n, load_content_neighbours
+from columnar import filter_frame, find_source, read_table, source_format
 
 # Initialize numpy
 # np.import_array()
 
 logger = logging.getLogger(__name__)
 
+FEATURE_COLS = ['popularity', 'danceability', 'energy', 'acousticness',
+                'instrumentalness', 'liveness', 'valence', 'tempo']
+# Catalog columns shown with recommendations; the model reads these and the
+# features, nothing else
+DISPLAY_COLUMNS = ['track_id', 'track_name', 'artists', 'track_genre']
+CATALOG_COLUMNS = DISPLAY_COLUMNS + FEATURE_COLS
+RATING_COLUMNS = ['user_id', 'track_id', 'rating']
+# Filters behind the app's sample track categories (see query_catalog)
+SAMPLE_CATEGORIES = {
+    "Popular Acoustic": [('track_genre', '==', 'acoustic'), ('popularity', '>', 0.7)],
+    "High Energy": [('energy', '>', 0.8)],
+    "Chill Tracks": [('energy', '<', 0.4), ('acousticness', '>', 0.6)],
+}
+
 class SpotifyModel:
-    def __init__(self):
+    def __init__(self, content_backend='exact', content_index_params=None, artifact_dir=None,
+                 lazy=False, compact=False, precomputed_dir=None, model_dir=None,
+                 shared=None, shared_registry=DEFAULT_REGISTRY, data_dir='data', data_format='auto'):
+        self.load_times = {}
+        self.artifact_dir = artifact_dir
+        # data_cleaned and user_matrix as CSV, Parquet or Feather (python columnar.py convert);
+        # auto takes a columnar copy when there is an up to date one
+        self.data_dir = data_dir
+        self.data_format = data_format
+        self.catalog_source = find_source(data_dir, 'data_cleaned', data_format)
+        # Name of arrays published with publish_shared(); attached instead of loaded
+        self.shared = None
+        if shared is not None:
+            with self._timed('shared_arrays'):
+                self.shared = SharedArrays(shared, shared_registry)
+        # Pickles from python train.py (a version directory or its root); defaults to the cwd
+        self.model_dir = model_dir
+        # Precomputed tables (python precompute.py); defaults to the artifact bundle
+        self.precomputed_dir = precomputed_dir
+        # Compact mode: shared int32 track id codes, int32/float32 numerics,
+        # categorical artists/genre
+        self.compact = compact
+        self.track_vocab = None
+        # Collaborative components stay empty until collaborative_ready is set
+        self.collaborative_ready = threading.Event()
+        self.collaborative_error = None
+        self.svd = None
+        # Trained SVD hyperparameters, from the pickle or saved with the arrays
+        self.svd_params = None
+        # (new_df, user_items, svd_scorer), replaced as a whole so readers
+        # never mix components from before and after an update
+        self._collaborative = (pd.DataFrame(), None, None)
+        self.collaborative_top_n = None
+        # Online updates (add_ratings) and drift against a full retrain
+        self._update_lock = threading.Lock()
+        self.online_users = set()
+        self.drift = None
         try:
-            # Load pre-trained models with error handling
-            model_path = 'nn_model.pkl'
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file {model_path} not found")
-            
+            self._load_content(content_backend, content_index_params)
+        except Exception as e:
+            logger.error(f"Error initializing SpotifyModel: {str(e)}")
+            raise
+
+        if lazy:
+            # Serve content-based requests now; SVD and the user matrix follow
+            threading.Thread(target=self._load_collaborative_in_background,
+                             name='collaborative-loader', daemon=True).start()
+        else:
             try:
-                with open(model_path, 'rb') as file:
-                    self.nn_model_content = pickle.load(file)
+                self._load_collaborative()
             except Exception as e:
-                raise RuntimeError(f"Error loading content-based model: {str(e)}")
-
-            # Load SVD model with graceful fallback
-            svd_path = 'svd_model.pkl'
-            self.svd = None
-            if os.path.exists(svd_path):
-                try:
-                    with open(svd_path, 'rb') as file:
-                        self.svd = pickle.load(file)
-                except Exception as e:
-                    logger.error(f"Error loading SVD model: {str(e)}")
-                    logger.warning("Collaborative filtering will be disabled")
-            else:
-                logger.warning(f"SVD model file {svd_path} not found")
-
-            # Load data with error handling
+                logger.error(f"Error initializing SpotifyModel: {str(e)}")
+                raise
+
+    def _load_content(self, content_backend, content_index_params):
+        if self.shared is not None:
+            self._attach_shared_content()
+        elif self.artifact_dir is not None:
+            # Precompiled bundle: memory-mapped arrays, no pickles and no scaler refit
+            self._load_artifacts(self.artifact_dir)
+        else:
+            self._load_pickles()
+
+        # Load data with error handling
+        try:
+            with self._timed('data_cleaned'):
+                self.data_cleaned = read_table(self.catalog_source, CATALOG_COLUMNS)
+            if self.data_cleaned.empty:
+                logger.warning(f"{self.catalog_source} is empty")
+            elif self.compact:
+                self.data_cleaned = self._compact_catalog(self.data_cleaned)
+        except FileNotFoundError as e:
+            logger.error(f"Data file not found: {str(e)}")
+            self.data_cleaned = pd.DataFrame()
+        except Exception as e:
+            logger.error(f"Error loading data: {str(e)}")
+            self.data_cleaned = pd.DataFrame()
+
+        # Prepare content features
+        self.data_content_features = self.data_cleaned[FEATURE_COLS]
+        if self.artifact_dir is None and self.shared is None:
+            with self._timed('scaler_fit'):
+                self.scaler = StandardScaler()
+                if self.compact:
+                    # Fit in float64 so scaler parameters match the default mode
+                    features = self.data_content_features.astype(np.float64)
+                    self.data_content_scaled = self.scaler.fit_transform(features).astype(np.float32)
+                    self._compact_nn_model()
+                else:
+                    self.data_content_scaled = self.scaler.fit_transform(self.data_content_features)
+        elif len(self.data_content_scaled) != len(self.data_cleaned):
+            raise RuntimeError(f"Artifact bundle {self.version} has {len(self.data_content_scaled)} "
+                               f"tracks but {self.catalog_source} has {len(self.data_cleaned)}")
+
+        # Content search goes through a pluggable index (exact or approximate)
+        self.content_index = build_content_index(
+            self.nn_model_content, self.data_content_scaled,
+            backend=content_backend, **(content_index_params or {})
+        )
+        self.content_neighbours = self._load_neighbour_table()
+
+    def _precomputed_path(self):
+        if self.precomputed_dir is None and self.artifact_dir is not None:
+            return resolve_artifact_dir(self.artifact_dir)
+        return self.precomputed_dir
+
+    def _load_neighbour_table(self):
+        path = self._precomputed_path()
+        if path is None:
+            return None
+        with self._timed('content_neighbours'):
+            table = load_content_neighbours(path)
+        if table is None:
+            return None
+        # A table from another model build would point at the wrong rows
+        if table.meta['model_version'] != self.version or len(table) != len(self.data_content_scaled):
+            logger.warning(f"Ignoring content neighbour table for model {table.meta['model_version']}; "
+                           f"loaded model is {self.version}")
+            return None
+        return table
+
+    def _load_collaborative(self):
+        if self.artifact_dir is None and self.shared is None:
+            svd = self._load_svd_pickle()
+        else:
+            svd = None
+
+        # Load data with error handling
+        try:
+            ratings_source = find_source(self.data_dir, 'user_matrix', self.data_format)
+            with self._timed('user_matrix'):
+                new_df = read_table(ratings_source, RATING_COLUMNS)
+            if new_df.empty:
+                logger.warning(f"{ratings_source} is empty")
+            elif self.compact:
+                new_df = self._compact_ratings(new_df)
+        except FileNotFoundError as e:
+            logger.error(f"Data file not found: {str(e)}")
+            new_df = pd.DataFrame()
+        except Exception as e:
+            logger.error(f"Error loading data: {str(e)}")
+            new_df = pd.DataFrame()
+
+        # Index each user's rated items once for exclusion masks and lookups
+        user_items = None
+        svd_scorer = None
+        if self.shared is not None and not new_df.empty:
+            user_items, svd_scorer = self._attach_shared_collaborative(new_df)
+        elif not new_df.empty:
+            with self._timed('user_items'):
+                user_items = UserItemIndex(new_df)
+
+        # Export the SVD factors once for vectorized collaborative scoring
+        if user_items is not None and svd_scorer is None:
+            if svd is not None:
+                svd_scorer = SVDScorer.from_surprise(svd, user_items.item_ids)
+            elif self._svd_arrays is not None:
+                svd_scorer = SVDScorer(item_ids=user_items.item_ids, **self._svd_arrays)
+
+        collaborative_top_n = None
+        if svd_scorer is not None:
+            collaborative_top_n = self._load_top_n_table()
+
+        self.svd = svd
+        if svd is not None:
+            self.svd_params = svd_params(svd)
+        self.collaborative_top_n = collaborative_top_n
+        self._collaborative = (new_df, user_items, svd_scorer)
+        self.collaborative_ready.set()
+
+    @property
+    def new_df(self):
+        return self._collaborative[0]
+
+    @property
+    def user_items(self):
+        return self._collaborative[1]
+
+    @property
+    def svd_scorer(self):
+        return self._collaborative[2]
+
+    def collaborative_snapshot(self):
+        # Consistent (new_df, user_items, svd_scorer) for one request
+        return self._collaborative
+
+    def query_catalog(self, filters, columns=DISPLAY_COLUMNS, limit=None):
+        # Catalog rows matching filters ((column, op, value) tuples, all of
+        # which hold). A columnar source answers from the file with the
+        # filters pushed into the scan; otherwise data_cleaned is filtered
+        if source_format(self.catalog_source) != 'csv':
             try:
-                self.data_cleaned = pd.read_csv('data/data_cleaned.csv')
-                self.new_df = pd.read_csv('data/user_matrix.csv')
-                
-                if self.data_cleaned.empty:
-                    logger.warning("data_cleaned.csv is empty")
-                if self.new_df.empty:
-                    logger.warning("user_matrix.csv is empty")
-                    
-            except FileNotFoundError as e:
-                logger.error(f"Data file not found: {str(e)}")
-                self.data_cleaned = pd.DataFrame()
-                self.new_df = pd.DataFrame()
+                return read_table(self.catalog_source, columns, filters, limit)
             except Exception as e:
-                logger.error(f"Error loading data: {str(e)}")
-                self.data_cleaned = pd.DataFrame()
-                self.new_df = pd.DataFrame()
+                logger.warning(f"Falling back to in-memory filtering: {str(e)}")
+        return filter_frame(self.data_cleaned, filters, columns, limit).reset_index(drop=True)
+
+    def add_ratings(self, user_id, ratings, n_epochs=5):
+        """Apply new ratings ({track_id: rating}) for one user without retraining.
+
+        The ratings are appended to new_df and the user/item index, and the
+        user's SVD factors are folded in against the fixed item factors. The
+        next request sees all three at once.
+        """
+        start = time.perf_counter()
+        self.apply_ratings(pd.DataFrame({
+            'user_id': [user_id] * len(ratings),
+            'track_id': list(ratings),
+            'rating': list(ratings.values()),
+        }), n_epochs=n_epochs)
+        logger.info(f"Folded in {len(ratings)} ratings for user {user_id} "
+                    f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def apply_ratings(self, rows, n_epochs=5, fold_in=True):
+        """Apply a batch of (user_id, track_id, rating) rows as one update.
+
+        Like add_ratings for any number of users: the index and new_df grow
+        by the batch, and with ``fold_in`` every user in it is refitted (with
+        all of their ratings). Without it the SVD factors are left alone until
+        the next retrain. A track the user has already rated has its rating
+        replaced rather than added twice, the latest rating winning. Returns
+        the user ids the batch touched.
+        """
+        if not self.collaborative_ready.is_set() or self.svd_scorer is None:
+            raise RuntimeError("Collaborative model is not available")
+        users = pd.unique(rows['user_id']).tolist()
+        rows = rows[['user_id', 'track_id', 'rating']].drop_duplicates(['user_id', 'track_id'], keep='last')
+        with self._update_lock:
+            new_df, user_items, svd_scorer = self._collaborative
+            entries = user_items.entries(rows['user_id'].tolist(), rows['track_id'].tolist())
+            rerated = entries >= 0
+            if rerated.any():
+                ratings = rows['rating'].to_numpy()[rerated]
+                user_items = user_items.with_ratings(entries[rerated], ratings)
+                new_df = self._replace_ratings(new_df, user_items.rows[entries[rerated]], ratings)
+                rows = rows[~rerated]
+            if len(rows):
+                rows = rows.set_axis(pd.RangeIndex(len(new_df), len(new_df) + len(rows)))
+                user_items = user_items.appended(rows, len(new_df))
+                new_df = self._append_ratings(new_df, rows)
+            if user_items.n_items > len(svd_scorer.item_ids):
+                svd_scorer = svd_scorer.with_items(user_items.item_ids)
+            if fold_in:
+                updates = []
+                for user_id in users:
+                    span = user_items.user_slice(user_id)
+                    updates.append((user_id, user_items.item_ids[user_items.indices[span]],
+                                    user_items.ratings[span]))
+                svd_scorer = svd_scorer.fold_in_many(updates, n_epochs=n_epochs, **self._fold_in_params())
+            self._collaborative = (new_df, user_items, svd_scorer)
+            if fold_in:
+                self.online_users.update(users)
+        return users
+
+    def _replace_ratings(self, new_df, positions, ratings):
+        # new_df with the ratings at row positions replaced; the frame in use
+        # by other requests is left as it was
+        column = new_df['rating'].to_numpy().copy()
+        column[positions] = ratings
+        return new_df.assign(rating=column)
+
+    def _append_ratings(self, new_df, rows):
+        if not self.compact:
+            return pd.concat([new_df, rows])
+        # Append codes directly: concatenating categoricals would compare the
+        # whole vocabulary on every call
+        codes = self.track_vocab.get_indexer(rows['track_id'])
+        track_ids = new_df['track_id']
+        if (codes < 0).any():
+            missing = pd.unique(rows['track_id'][codes < 0])
+            self.track_vocab = self.track_vocab.append(pd.Index(missing))
+            codes = self.track_vocab.get_indexer(rows['track_id'])
+            track_ids = track_ids.cat.set_categories(self.track_vocab)
+        return pd.DataFrame({
+            'user_id': np.concatenate([new_df['user_id'].to_numpy(), rows['user_id'].to_numpy(np.int32)]),
+            'track_id': pd.Categorical.from_codes(
+                np.concatenate([track_ids.cat.codes.to_numpy(), codes]), dtype=track_ids.dtype
+            ),
+            'rating': np.concatenate([new_df['rating'].to_numpy(), rows['rating'].to_numpy(np.float32)]),
+        }, index=pd.RangeIndex(len(new_df) + len(rows)))
+
+    def _fold_in_params(self):
+        # Learning rate and regularization of the trained model, if known
+        if not self.svd_params:
+            return {}
+        return {'lr': self.svd_params['lr_pu'], 'reg': self.svd_params['reg_pu']}
+
+    def measure_drift(self, n=10, baseline_users=100):
+        # Retrain SVD on the current ratings and compare users updated online.
+        # Untouched users give the baseline difference between two trainings.
+        from surprise import SVD, Dataset, Reader
+
+        new_df, user_items, svd_scorer = self.collaborative_snapshot()
+        start = time.perf_counter()
+        params = {'n_factors': svd_scorer.pu.shape[1], 'biased': svd_scorer.biased}
+        params.update(self.svd_params or {})
+        ratings = new_df[['user_id', 'track_id', 'rating']].astype({'track_id': object})
+        rating_scale = svd_scorer.rating_scale or (ratings['rating'].min(), ratings['rating'].max())
+        trainset = Dataset.load_from_df(ratings, Reader(rating_scale=rating_scale)).build_full_trainset()
+        reference = SVDScorer.from_surprise(SVD(**params).fit(trainset), svd_scorer.item_ids)
+
+        updated = sorted(self.online_users)
+        untouched = [user for user in user_items.user_ids[:baseline_users + len(updated)].tolist()
+                     if user not in self.online_users][:baseline_users]
+        self.drift = {
+            'online': score_drift(svd_scorer, reference, updated, n=n),
+            'baseline': score_drift(svd_scorer, reference, untouched, n=n),
+            'seconds': time.perf_counter() - start,
+        }
+        logger.info(f"SVD drift against full retrain: {self.drift}")
+        return self.drift
 
-            # Prepare content features
-            self.data_content_features = self.data_cleaned[['popularity', 'danceability', 'energy', 
-                                                          'acousticness', 'instrumentalness', 
-                                                          'liveness', 'valence', 'tempo']]
-            self.scaler = StandardScaler()
-            self.data_content_scaled = self.scaler.fit_transform(self.data_content_features)
+    def start_drift_monitor(self, interval=3600):
+        # Measure drift every interval seconds while there are online updates
+        def monitor():
+            measured = 0
+            while not stop.wait(interval):
+                if len(self.online_users) != measured:
+                    measured = len(self.online_users)
+                    try:
+                        self.measure_drift()
+                    except Exception as e:
+                        logger.error(f"Error measuring SVD drift: {str(e)}")
 
+        stop = threading.Event()
+        threading.Thread(target=monitor, name='svd-drift-monitor', daemon=True).start()
+        return stop
+
+    def _load_top_n_table(self):
+        path = self._precomputed_path()
+        if path is None:
+            return None
+        with self._timed('collaborative_top_n'):
+            table = load_collaborative_top_n(path)
+        if table is not None and table.meta['model_version'] != self.version:
+            logger.warning(f"Ignoring collaborative top-N table for model {table.meta['model_version']}; "
+                           f"loaded model is {self.version}")
+            return None
+        return table
+
+    def _load_collaborative_in_background(self):
+        try:
+            self._load_collaborative()
+            logger.info("Collaborative filtering is ready")
         except Exception as e:
-            logger.error(f"Error initializing SpotifyModel: {str(e)}")
-            raise
+            logger.error(f"Error loading collaborative components: {str(e)}")
+            logger.warning("Collaborative filtering will be disabled")
+            self.collaborative_error = e
+            self.collaborative_ready.set()
+
+    def wait_for_collaborative(self, timeout=None):
+        return self.collaborative_ready.wait(timeout)
+
+    def _compact_catalog(self, data_cleaned):
+        # Track ids become codes into track_vocab; the user matrix extends the
+        # same vocabulary later, so catalog codes stay valid for both tables
+        self.track_vocab = pd.Index(pd.unique(data_cleaned['track_id']))
+        data_cleaned['track_id'] = pd.Categorical(data_cleaned['track_id'], categories=self.track_vocab)
+        for column in ('artists', 'track_genre'):
+            if column in data_cleaned:
+                data_cleaned[column] = data_cleaned[column].astype('category')
+        data_cleaned[FEATURE_COLS] = data_cleaned[FEATURE_COLS].astype(np.float32)
+        return data_cleaned
+
+    def _compact_ratings(self, new_df):
+        track_ids = pd.Index(pd.unique(new_df['track_id']))
+        if self.track_vocab is None:
+            self.track_vocab = track_ids
+        else:
+            self.track_vocab = self.track_vocab.append(track_ids.difference(self.track_vocab, sort=False))
+        new_df['track_id'] = pd.Categorical(new_df['track_id'], categories=self.track_vocab)
+        new_df['user_id'] = new_df['user_id'].astype(np.int32)
+        new_df['rating'] = new_df['rating'].astype(np.float32)
+        return new_df
+
+    def _compact_nn_model(self):
+        # A brute-force NearestNeighbors keeps its own float64 copy of the
+        # training matrix; refit it on the float32 one instead
+        if getattr(self.nn_model_content, '_fit_method', None) == 'brute':
+            self.nn_model_content = NearestNeighbors(
+                **self.nn_model_content.get_params()
+            ).fit(self.data_content_scaled)
+
+    def publish_shared(self, name, registry_dir=DEFAULT_REGISTRY):
+        """Publish the numeric model state as shared memory segments.
+
+        Other processes attach with ``SpotifyModel(shared=name)`` and read
+        the same physical pages. Publishing again under the same name swaps
+        in the new arrays; the previous segments are unlinked and freed once
+        their last attached process drops them.
+        """
+        self.wait_for_collaborative()
+        scaler = self.scaler
+        arrays = {
+            'content_scaled': self.data_content_scaled,
+            'scaler_mean': scaler.mean_,
+            'scaler_scale': scaler.scale_,
+            'scaler_var': scaler.var_,
+            'scaler_n_samples_seen': np.asarray(scaler.n_samples_seen_),
+        }
+        nn_model = self.nn_model_content
+        meta = {
+            'model_version': self.version,
+            'feature_columns': list(getattr(scaler, 'feature_names_in_', [])),
+            'content_index': {'metric': nn_model.metric, 'p': getattr(nn_model, 'p', 2),
+                              'algorithm': nn_model.algorithm, 'n_neighbors': nn_model.n_neighbors},
+            'n_ratings': None,
+            'svd': None,
+        }
+        new_df, user_items, svd_scorer = self.collaborative_snapshot()
+        if user_items is not None:
+            arrays.update(user_ids=_id_array(user_items.user_ids), item_ids=_id_array(user_items.item_ids),
+                          ui_indptr=user_items.indptr, ui_indices=user_items.indices,
+                          ui_ratings=user_items.ratings, ui_rows=user_items.rows)
+            meta['n_ratings'] = len(new_df)
+        if svd_scorer is not None:
+            arrays.update(svd_pu=svd_scorer.pu, svd_qi=svd_scorer.qi, svd_bu=svd_scorer.bu,
+                          svd_bi=svd_scorer.bi, svd_user_ids=_ids_by_inner(svd_scorer.user_index),
+                          svd_item_ids=_ids_by_inner(svd_scorer.item_index),
+                          svd_item_factors=svd_scorer.item_factors, svd_item_bias=svd_scorer.item_bias,
+                          svd_item_known=svd_scorer.item_known)
+            meta['svd'] = {
+                'global_mean': svd_scorer.global_mean,
+                'rating_scale': list(svd_scorer.rating_scale) if svd_scorer.rating_scale else None,
+                'biased': bool(svd_scorer.biased),
+                'params': self.svd_params,
+            }
+        return publish(name, arrays, meta=meta, registry_dir=registry_dir)
+
+    def _attach_shared_content(self):
+        shared = self.shared
+        self._use_model_arrays(shared.meta['model_version'], shared.meta, shared)
+
+    def _attach_shared_collaborative(self, new_df):
+        # (user_items, svd_scorer) over the shared arrays, or (None, None) to
+        # index locally; the user matrix must be the one they came from
+        shared = self.shared
+        meta = shared.meta
+        if 'ui_indptr' not in shared:
+            return None, None
+        if meta['n_ratings'] != len(new_df):
+            logger.warning(f"Shared arrays {shared.version} were published from {meta['n_ratings']} "
+                           f"ratings but the user matrix has {len(new_df)}; indexing locally")
+            return None, None
+        with self._timed('user_items'):
+            user_items = UserItemIndex.from_arrays(
+                shared['user_ids'], shared['item_ids'], shared['ui_indptr'], shared['ui_indices'],
+                shared['ui_ratings'], shared['ui_rows'])
+        svd_scorer = None
+        if self._svd_arrays is not None:
+            svd_scorer = SVDScorer.from_aligned(
+                item_ids=user_items.item_ids, item_factors=shared['svd_item_factors'],
+                item_bias=shared['svd_item_bias'], item_known=shared['svd_item_known'],
+                **self._svd_arrays
+            )
+        return user_items, svd_scorer
+
+    def memory_usage(self):
+        # Bytes held per component
+        usage = {
+            'data_cleaned': _frame_nbytes(self.data_cleaned),
+            'new_df': _frame_nbytes(self.new_df),
+            'data_content_scaled': _nbytes(self.data_content_scaled),
+            'nn_model': _nbytes(getattr(self.nn_model_content, '_fit_X', None)),
+        }
+        if self.user_items is not None:
+            user_items = self.user_items
+            usage['user_items'] = sum(_nbytes(a) for a in (user_items.indptr, user_items.indices,
+                                                           user_items.ratings, user_items.rows))
+        if self.svd_scorer is not None:
+            scorer = self.svd_scorer
+            usage['svd_scorer'] = sum(_nbytes(a) for a in (scorer.pu, scorer.qi, scorer.bu, scorer.bi,
+                                                           scorer.item_factors, scorer.item_bias))
+        if self.track_vocab is not None:
+            # Shared by both tables, so counted once
+            usage['track_vocab'] = int(self.track_vocab.memory_usage(deep=True))
+        usage['total'] = sum(usage.values())
+        return usage
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        yield
+        self.load_times[name] = time.perf_counter() - start
+        logger.info(f"Loaded {name} in {self.load_times[name]:.3f}s")
+
+    def _load_pickles(self):
+        self._svd_arrays = None
+        # Load pre-trained models with error handling
+        model_path = os.path.join(self._pickle_dir(), 'nn_model.pkl')
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file {model_path} not found")
+        
+        try:
+            with self._timed('nn_model'), open(model_path, 'rb') as file:
+                self.nn_model_content = pickle.load(file)
+        except Exception as e:
+            raise RuntimeError(f"Error loading content-based model: {str(e)}")
+
+        self.version = f"pickle-{int(os.path.getmtime(model_path))}"
+
+    def _pickle_dir(self):
+        if self.model_dir is None:
+            return '.'
+        return resolve_artifact_dir(self.model_dir, marker='nn_model.pkl')
+
+    def _load_svd_pickle(self):
+        # Load SVD model with graceful fallback
+        svd_path = os.path.join(self._pickle_dir(), 'svd_model.pkl')
+        svd = None
+        if os.path.exists(svd_path):
+            try:
+                with self._timed('svd_model'), open(svd_path, 'rb') as file:
+                    svd = pickle.load(file)
+            except Exception as e:
+                logger.error(f"Error loading SVD model: {str(e)}")
+                logger.warning("Collaborative filtering will be disabled")
+        else:
+            logger.warning(f"SVD model file {svd_path} not found")
+
+        return svd
+
+    def _load_artifacts(self, artifact_dir):
+        manifest, arrays, load_times = load_artifacts(artifact_dir)
+        self.load_times.update(load_times)
+        for name, seconds in load_times.items():
+            logger.info(f"Loaded {name} in {seconds:.3f}s")
+        arrays = {**arrays, **{f"scaler_{name}": array for name, array in arrays['scaler'].items()}}
+        self._use_model_arrays(manifest['version'], manifest, arrays)
+        if manifest['svd'] is None:
+            logger.warning("Artifact bundle has no SVD factors; collaborative filtering will be disabled")
+
+    def _use_model_arrays(self, version, meta, arrays):
+        # Content model and SVD factors over arrays from an artifact bundle or
+        # shared memory; meta is the bundle manifest or the shared metadata
+        self.version = version
+        self.data_content_scaled = arrays['content_scaled']
+        self.scaler = StandardScaler()
+        self.scaler.mean_ = arrays['scaler_mean']
+        self.scaler.scale_ = arrays['scaler_scale']
+        self.scaler.var_ = arrays['scaler_var']
+        self.scaler.n_samples_seen_ = arrays['scaler_n_samples_seen']
+        self.scaler.n_features_in_ = len(self.scaler.mean_)
+        if meta['feature_columns']:
+            self.scaler.feature_names_in_ = np.asarray(meta['feature_columns'], dtype=object)
+
+        # Brute-force neighbours only keep a reference to the mapped or
+        # shared matrix, not a copy
+        params = meta['content_index']
+        with self._timed('nn_model'):
+            self.nn_model_content = NearestNeighbors(
+                n_neighbors=params['n_neighbors'], metric=params['metric'],
+                p=params['p'], algorithm=params['algorithm']
+            ).fit(self.data_content_scaled)
+
+        self._svd_arrays = None
+        svd = meta['svd']
+        if svd is not None:
+            self._svd_arrays = {
+                'pu': arrays['svd_pu'],
+                'qi': arrays['svd_qi'],
+                'bu': arrays['svd_bu'],
+                'bi': arrays['svd_bi'],
+                'global_mean': svd['global_mean'],
+                'user_index': {raw: inner for inner, raw in enumerate(arrays['svd_user_ids'].tolist())},
+                'item_index': {raw: inner for inner, raw in enumerate(arrays['svd_item_ids'].tolist())},
+                'rating_scale': tuple(svd['rating_scale']) if svd['rating_scale'] else None,
+                'biased': svd['biased'],
+            }
+            self.svd_params = svd.get('params')
+            if self.svd_params is None:
+                logger.warning("No SVD hyperparameters saved with the model arrays; "
+                               "fold-in and drift retrains use Surprise defaults")
+
+
+def _frame_nbytes(frame):
+    # Categorical track ids count as codes only; their vocabulary is shared
+    usage = frame.memory_usage(deep=True, index=True)
+    if 'track_id' in frame and isinstance(frame['track_id'].dtype, pd.CategoricalDtype):
+        usage['track_id'] = frame['track_id'].cat.codes.nbytes
+    return int(usage.sum())
+
+
+def _nbytes(array):
+    # Memory maps and shared memory views aren't private to the process
+    if array is None or isinstance(array, np.memmap) or is_shared(array):
+        return 0
+    return array.nbytes
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare memory use of default and compact modes")
+    parser.add_argument('--artifact-dir', default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for compact in (False, True):
+        model = SpotifyModel(artifact_dir=args.artifact_dir, compact=compact)
+        results['compact' if compact else 'default'] = model.memory_usage()
+        del model
+    print(f"{'component':<22}{'default MB':>12}{'compact MB':>12}")
+    names = [name for name in dict.fromkeys([*results['default'], *results['compact']]) if name != 'total']
+    for name in names + ['total']:
+        default_mb = results['default'].get(name, 0) / 2**20
+        compact_mb = results['compact'].get(name, 0) / 2**20
+        print(f"{name:<22}{default_mb:>12.1f}{compact_mb:>12.1f}")
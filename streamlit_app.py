@@ -1,20 +1,74 @@
 import streamlit as st
 import logging
-from spotify_model import SpotifyModel
+import os
+from spotify_model import SAMPLE_CATEGORIES, SpotifyModel
 from spotify_client import initialize_spotify_client
 from cache import SpotifyCache
+from spotify_fetcher import SpotifyFetcher
 from recommender import Recommender
+from metrics import Metrics
+from result_cache import ResultCache
 import pandas as pd
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize components
-spotify_model = SpotifyModel()
-spotify_client = initialize_spotify_client()
-cache = SpotifyCache()
-recommender = Recommender(spotify_model, spotify_client, cache)
+# Initialize components once per process; reruns and sessions share them
+@st.cache_resource
+def load_model():
+    # Prefer the precompiled artifact bundle (python artifacts.py build) when present;
+    # collaborative components finish loading in the background
+    artifact_dir = 'artifacts' if os.path.isdir('artifacts') else None
+    # Tables from python precompute.py; bundles carry their own
+    precomputed_dir = 'precomputed' if artifact_dir is None and os.path.isdir('precomputed') else None
+    # Pickles from python train.py, else the ones in the working directory
+    model_dir = 'models' if os.path.isdir('models') else None
+    return SpotifyModel(artifact_dir=artifact_dir, lazy=True, precomputed_dir=precomputed_dir,
+                        model_dir=model_dir)
+
+@st.cache_resource
+def load_metrics():
+    # Per-stage latencies and cache counters, logged as JSON every minute
+    metrics = Metrics()
+    metrics.start_log_sink(interval=60)
+    return metrics
+
+@st.cache_resource
+def load_recommender():
+    metrics = load_metrics()
+    spotify_client = initialize_spotify_client()
+    cache = SpotifyCache(metrics=metrics)
+    fetcher = SpotifyFetcher(spotify_client, cache, metrics=metrics)
+    return Recommender(load_model(), spotify_client, cache, fetcher=fetcher, metrics=metrics,
+                       result_cache=ResultCache(metrics=metrics))
+
+# Tab aggregations are computed once per ratings snapshot: online updates
+# only append to new_df, so (version, row count) identifies it
+@st.cache_data
+def user_matrix_statistics(_new_df, model_version, n_ratings):
+    new_df = _new_df
+    n_users = new_df['user_id'].nunique()
+    n_tracks = new_df['track_id'].nunique()
+    return {
+        'total_users': n_users,
+        'total_tracks': n_tracks,
+        'average_rating': round(new_df['rating'].mean(), 2),
+        'rating_std': round(new_df['rating'].std(), 2),
+        'total_ratings': len(new_df),
+        'density': round(len(new_df) / (n_users * n_tracks) * 100, 2),
+        'rating_dist': pd.DataFrame(new_df['rating'].value_counts().sort_index()),
+        'user_activity': pd.DataFrame(new_df['user_id'].value_counts()),
+    }
+
+@st.cache_data
+def sample_categories(_spotify_model, model_version):
+    # Columnar catalogs answer these from the file with the filters pushed down
+    return {category: _spotify_model.query_catalog(filters, limit=10)
+            for category, filters in SAMPLE_CATEGORIES.items()}
+
+spotify_model = load_model()
+recommender = load_recommender()
 
 # Add custom CSS (keep the original CSS)
 st.markdown("""
@@ -167,6 +221,11 @@ with st.sidebar:
     track_input = st.text_input("🎵 Track ID or Spotify URL", "5SuOikwiRyPMVoIQDJUgSV")
     top_n = st.slider("📊 Number of Recommendations", min_value=1, max_value=20, value=10)
 
+    with st.expander("⏱️ Performance", expanded=False):
+        summary = load_metrics().summary()
+        st.json({'latency_ms': summary['latency_ms'], 'cache_hit_ratio': summary['cache_hit_ratio']},
+                expanded=False)
+
 # Process Track Input
 track_id = None
 if track_input:
@@ -187,8 +246,7 @@ with tab1:
         try:
             with st.spinner("🎵 Creating your personalized playlist..."):
                 # Get track details if available
-                if track_id in spotify_model.data_cleaned['track_id'].values:
-                    track_details = spotify_model.data_cleaned[spotify_model.data_cleaned['track_id'] == track_id].iloc[0]
+                if track_id in recommender.track_index:
                     st.subheader("🌱 Seed Track")
                     st.markdown(f"""
                     <iframe style="border-radius:12px" 
@@ -234,10 +292,12 @@ with tab1:
 
 with tab2:
     st.header("User Matrix Data")
-    if not spotify_model.new_df.empty:
+    if not spotify_model.collaborative_ready.is_set():
+        st.info("User matrix is still loading, please check back in a moment")
+    elif not spotify_model.new_df.empty:
         # Add search/filter functionality
         search_user = st.number_input("Search by User ID", min_value=1, max_value=1000, value=1)
-        filtered_df = spotify_model.new_df[spotify_model.new_df['user_id'] == search_user]
+        filtered_df = spotify_model.new_df.iloc[spotify_model.user_items.user_rows(search_user)]
         
         # Display basic statistics
         st.subheader("User Listening Statistics")
@@ -257,51 +317,40 @@ with tab2:
 
 with tab3:
     st.header("User Matrix Statistics")
-    if not spotify_model.new_df.empty:
+    if not spotify_model.collaborative_ready.is_set():
+        st.info("User matrix is still loading, please check back in a moment")
+    elif not spotify_model.new_df.empty:
+        new_df = spotify_model.new_df
+        stats = user_matrix_statistics(new_df, spotify_model.version, len(new_df))
+
         # Overall statistics
         st.subheader("Overall Statistics")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Users", spotify_model.new_df['user_id'].nunique())
-            st.metric("Total Tracks", spotify_model.new_df['track_id'].nunique())
+            st.metric("Total Users", stats['total_users'])
+            st.metric("Total Tracks", stats['total_tracks'])
         with col2:
-            st.metric("Average Rating", round(spotify_model.new_df['rating'].mean(), 2))
-            st.metric("Rating Std Dev", round(spotify_model.new_df['rating'].std(), 2))
+            st.metric("Average Rating", stats['average_rating'])
+            st.metric("Rating Std Dev", stats['rating_std'])
         with col3:
-            st.metric("Total Ratings", len(spotify_model.new_df))
-            st.metric("Rating Density", f"{round(len(spotify_model.new_df)/(spotify_model.new_df['user_id'].nunique()*spotify_model.new_df['track_id'].nunique())*100, 2)}%")
+            st.metric("Total Ratings", stats['total_ratings'])
+            st.metric("Rating Density", f"{stats['density']}%")
         
         # Rating distribution
         st.subheader("Rating Distribution")
-        rating_dist = pd.DataFrame(spotify_model.new_df['rating'].value_counts().sort_index())
-        st.bar_chart(rating_dist)
+        st.bar_chart(stats['rating_dist'])
         
         # User activity distribution
         st.subheader("User Activity Distribution")
-        user_activity = pd.DataFrame(spotify_model.new_df['user_id'].value_counts())
-        st.line_chart(user_activity)
+        st.line_chart(stats['user_activity'])
     else:
         st.warning("User matrix data is not available")
 
 with tab4:
     st.header("🎵 Sample Tracks to Try")
     
-    # Create sample categories
-    categories = {
-        "Popular Acoustic": spotify_model.data_cleaned[
-            (spotify_model.data_cleaned['track_genre'] == 'acoustic') & 
-            (spotify_model.data_cleaned['popularity'] > 0.7)
-        ].head(10),
-        
-        "High Energy": spotify_model.data_cleaned[
-            (spotify_model.data_cleaned['energy'] > 0.8)
-        ].head(10),
-        
-        "Chill Tracks": spotify_model.data_cleaned[
-            (spotify_model.data_cleaned['energy'] < 0.4) & 
-            (spotify_model.data_cleaned['acousticness'] > 0.6)
-        ].head(10)
-    }
+    # Sample categories are filtered once per model version
+    categories = sample_categories(spotify_model, spotify_model.version)
     
     # Display tracks by category with table layout
     for category, tracks in categories.items():
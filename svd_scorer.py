@@ -0,0 +1,300 @@
+import copy
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Surprise SVD hyperparameters saved with artifact bundles and shared arrays,
+# so fold-in and drift retrains use the trained values without the pickle
+SVD_PARAMS = ('n_factors', 'n_epochs', 'biased', 'init_mean', 'init_std_dev', 'lr_bu', 'lr_bi',
+              'lr_pu', 'lr_qi', 'reg_bu', 'reg_bi', 'reg_pu', 'reg_qi', 'random_state')
+
+
+def svd_params(svd):
+    # JSON-safe SVD_PARAMS of a Surprise SVD; a RandomState object isn't kept
+    params = {}
+    for name in SVD_PARAMS:
+        value = getattr(svd, name, None)
+        if isinstance(value, np.generic):
+            value = value.item()
+        if name == 'random_state' and not isinstance(value, (int, type(None))):
+            continue
+        params[name] = value
+    return params
+
+
+class SVDScorer:
+    """Vectorized scoring over the factors of a trained Surprise SVD model.
+
+    Scores match ``SVD.predict(uid, iid).est``: unknown users/items fall back
+    the same way Surprise does and estimates are clipped to the rating scale.
+    """
+
+    def __init__(self, pu, qi, bu, bi, global_mean, user_index, item_index,
+                 item_ids, rating_scale=None, biased=True):
+        self.pu = np.asarray(pu, dtype=np.float64)
+        self.qi = np.asarray(qi, dtype=np.float64)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        # Raw id -> inner id, as in trainset._raw2inner_id_users/_items
+        self.user_index = user_index
+        self.item_index = item_index
+        self.rating_scale = rating_scale
+        self.biased = biased
+        self._align_items(item_ids)
+
+    @classmethod
+    def from_surprise(cls, svd, item_ids):
+        trainset = svd.trainset
+        return cls(
+            pu=svd.pu,
+            qi=svd.qi,
+            bu=svd.bu,
+            bi=svd.bi,
+            global_mean=trainset.global_mean,
+            user_index=dict(trainset._raw2inner_id_users),
+            item_index=dict(trainset._raw2inner_id_items),
+            item_ids=item_ids,
+            rating_scale=trainset.rating_scale,
+            biased=svd.biased,
+        )
+
+    @classmethod
+    def from_aligned(cls, pu, qi, bu, bi, global_mean, user_index, item_index, item_ids,
+                     item_factors, item_bias, item_known, rating_scale=None, biased=True):
+        # Scorer over already aligned item arrays (e.g. shared memory views), no copies
+        scorer = cls.__new__(cls)
+        scorer.pu, scorer.qi, scorer.bu, scorer.bi = pu, qi, bu, bi
+        scorer.global_mean = float(global_mean)
+        scorer.user_index = user_index
+        scorer.item_index = item_index
+        scorer.rating_scale = rating_scale
+        scorer.biased = biased
+        scorer.item_ids = np.asarray(item_ids, dtype=object)
+        scorer.item_factors = item_factors
+        scorer.item_bias = item_bias
+        scorer.item_known = item_known
+        return scorer
+
+    def _align_items(self, item_ids):
+        # Lay the factors out along item_ids so a user's scores are one mat-vec
+        self.item_ids = np.asarray(item_ids, dtype=object)
+        inner = np.fromiter(
+            (self.item_index.get(iid, -1) for iid in self.item_ids),
+            dtype=np.int64, count=len(self.item_ids)
+        )
+        self.item_known = inner >= 0
+        self.item_factors = np.zeros((len(inner), self.qi.shape[1]))
+        self.item_factors[self.item_known] = self.qi[inner[self.item_known]]
+        self.item_bias = np.zeros(len(inner))
+        if self.biased:
+            self.item_bias[self.item_known] = self.bi[inner[self.item_known]]
+
+    def with_items(self, item_ids):
+        # Copy laid out along a longer item list whose prefix is the current one;
+        # items new to the list are unknown to the model until retraining
+        scorer = copy.copy(self)
+        extra = np.asarray(item_ids, dtype=object)[len(self.item_ids):]
+        inner = np.fromiter((self.item_index.get(iid, -1) for iid in extra),
+                            dtype=np.int64, count=len(extra))
+        known = inner >= 0
+        factors = np.zeros((len(extra), self.qi.shape[1]))
+        factors[known] = self.qi[inner[known]]
+        bias = np.zeros(len(extra))
+        if self.biased:
+            bias[known] = self.bi[inner[known]]
+        scorer.item_ids = np.concatenate([self.item_ids, extra])
+        scorer.item_known = np.concatenate([self.item_known, known])
+        scorer.item_factors = np.vstack([self.item_factors, factors])
+        scorer.item_bias = np.concatenate([self.item_bias, bias])
+        return scorer
+
+    def fold_in(self, user_id, item_ids, ratings, n_epochs=5, lr=0.005, reg=0.02):
+        # Copy of the scorer with one user refitted; see fold_in_many
+        return self.fold_in_many([(user_id, item_ids, ratings)], n_epochs=n_epochs, lr=lr, reg=reg)
+
+    def fold_in_many(self, updates, n_epochs=5, lr=0.005, reg=0.02):
+        """Copy of the scorer with each ``(user_id, item_ids, ratings)`` refitted.
+
+        Item factors stay fixed. A user the model has not seen gets a
+        regularized least-squares fit of (bu, pu); a known user gets
+        ``n_epochs`` SGD passes from the current factors, with Surprise's
+        update rule. Each user appears at most once. User arrays are copied
+        once per call, so readers of the original scorer (including read-only
+        memory maps) are unaffected.
+        """
+        scorer = copy.copy(self)
+        new_pu, new_bu = [], []
+        user_index = self.user_index
+        known_users, known_items, known_ratings = [], [], []
+        for user_id, item_ids, ratings in updates:
+            inner = np.fromiter((self.item_index.get(iid, -1) for iid in item_ids),
+                                dtype=np.int64, count=len(item_ids))
+            ratings = np.asarray(ratings, dtype=np.float64)[inner >= 0]
+            inner = inner[inner >= 0]
+
+            user_inner = self.user_index.get(user_id)
+            if user_inner is not None:
+                known_users.append(user_inner)
+                known_items.append(inner)
+                known_ratings.append(ratings)
+                continue
+            if len(inner) == 0:
+                continue
+            # Solve for [bu, pu] against residuals of the fixed item terms
+            qi = self.qi[inner]
+            if self.biased:
+                design = np.hstack([np.ones((len(inner), 1)), qi])
+                target = ratings - self.global_mean - self.bi[inner]
+            else:
+                design, target = qi, ratings
+            weights = np.linalg.solve(design.T @ design + reg * len(inner) * np.eye(design.shape[1]),
+                                      design.T @ target)
+            if user_index is self.user_index:
+                user_index = dict(self.user_index)
+            user_index[user_id] = len(self.bu) + len(new_bu)
+            new_bu.append(weights[0] if self.biased else 0.0)
+            new_pu.append(weights[1:] if self.biased else weights)
+
+        if not known_users and not new_pu:
+            return self
+        pu, bu = self.pu, self.bu
+        if known_users:
+            pu, bu = np.array(self.pu), np.array(self.bu)
+            users = np.asarray(known_users, dtype=np.int64)
+            pu[users], bu[users] = self._sgd(users, known_items, known_ratings, n_epochs, lr, reg)
+        scorer.pu = np.vstack([pu, new_pu]) if new_pu else pu
+        scorer.bu = np.append(bu, new_bu) if new_bu else bu
+        scorer.user_index = user_index
+        return scorer
+
+    def _sgd(self, users, items, ratings, n_epochs, lr, reg):
+        # Users are independent while item factors are fixed, so step j of
+        # every user's pass runs at once; the order within a user is kept.
+        # Users are sorted longest first, so those with a j-th rating are a prefix.
+        lengths = np.fromiter(map(len, items), dtype=np.int64, count=len(items))
+        order = np.argsort(-lengths, kind='stable')
+        lengths = lengths[order]
+        starts = np.zeros(len(order), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        flat_items = np.concatenate([items[k] for k in order])
+        flat_ratings = np.concatenate([ratings[k] for k in order])
+        # Number of users with a j-th rating, for each j
+        active = len(lengths) - np.searchsorted(lengths[::-1], np.arange(lengths[0]), side='right')
+
+        user_pu = np.array(self.pu[users[order]], dtype=np.float64)
+        user_bu = np.array(self.bu[users[order]], dtype=np.float64)
+        for _ in range(n_epochs):
+            for j, count in enumerate(active):
+                pos = starts[:count] + j
+                q = self.qi[flat_items[pos]]
+                pu = user_pu[:count]
+                err = flat_ratings[pos] - np.einsum('ij,ij->i', pu, q)
+                if self.biased:
+                    bu = user_bu[:count]
+                    err -= self.global_mean + bu + self.bi[flat_items[pos]]
+                    bu += lr * (err - reg * bu)
+                pu += lr * (err[:, None] * q - reg * pu)
+        # Back to the callers' order
+        restore = np.empty_like(order)
+        restore[order] = np.arange(len(order))
+        return user_pu[restore], user_bu[restore]
+
+    def user_scores(self, user_id):
+        return self.user_scores_many([user_id])[0]
+
+    def user_scores_many(self, user_ids):
+        # One (users x items) score matrix from a single matrix multiply
+        inner = np.fromiter(
+            (self.user_index.get(user_id, -1) for user_id in user_ids),
+            dtype=np.int64, count=len(user_ids)
+        )
+        known = inner >= 0
+        if self.biased:
+            scores = np.empty((len(inner), len(self.item_ids)))
+            scores[:] = self.global_mean + self.item_bias
+            if known.any():
+                known_inner = inner[known]
+                scores[known] += (self.bu[known_inner][:, None]
+                                  + self.pu[known_inner] @ self.item_factors.T)
+        else:
+            scores = np.full((len(inner), len(self.item_ids)), self.global_mean)
+            if known.any():
+                block = self.pu[inner[known]] @ self.item_factors.T
+                block[:, ~self.item_known] = self.global_mean
+                scores[known] = block
+        return self._clip(scores)
+
+    def scores_at(self, user_ids, positions):
+        # Scores of each user's own candidates: positions is (users x candidates)
+        # into item_ids, -1 for items outside the list (scored as unknown items).
+        # Same values as user_scores_many()[row, positions] without scoring every item.
+        inner = np.fromiter(
+            (self.user_index.get(user_id, -1) for user_id in user_ids),
+            dtype=np.int64, count=len(user_ids)
+        )
+        known = inner >= 0
+        listed = positions >= 0
+        positions = np.where(listed, positions, 0)
+        item_known = self.item_known[positions] & listed
+        if self.biased:
+            scores = self.global_mean + np.where(listed, self.item_bias[positions], 0.0)
+        else:
+            scores = np.full(positions.shape, self.global_mean)
+        if known.any():
+            known_inner = inner[known]
+            dots = (self.item_factors[positions[known]] @ self.pu[known_inner][:, :, None])[:, :, 0]
+            if self.biased:
+                scores[known] += self.bu[known_inner][:, None] + np.where(listed[known], dots, 0.0)
+            else:
+                scores[known] = np.where(item_known[known], dots, self.global_mean)
+        return self._clip(scores)
+
+    def _clip(self, scores):
+        if self.rating_scale is not None:
+            lower_bound, higher_bound = self.rating_scale
+            np.clip(scores, lower_bound, higher_bound, out=scores)
+        return scores
+
+    @staticmethod
+    def top_n(scores, n, exclude=None):
+        # Positions of the n highest scores, best first, skipping excluded items
+        if exclude is not None:
+            scores = np.where(exclude, -np.inf, scores)
+            n = min(n, len(scores) - int(np.count_nonzero(exclude)))
+        n = min(n, len(scores))
+        if n <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top], kind='stable')]
+
+    @staticmethod
+    def top_n_many(scores, n, exclude=None):
+        # Row-wise top_n; returns positions and a mask of the usable ones
+        if exclude is not None:
+            scores = np.where(exclude, -np.inf, scores)
+        n = min(n, scores.shape[1])
+        if n <= 0:
+            empty = np.empty((len(scores), 0), dtype=np.int64)
+            return empty, empty.astype(bool)
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        valid = np.isfinite(np.take_along_axis(top_scores, order, axis=1))
+        return top, valid
+
+
+def score_drift(scorer, reference, user_ids, n=10):
+    # How far online-updated users have moved from a fully retrained model:
+    # RMSE over all item scores and overlap of the top-n lists
+    if not len(user_ids):
+        return {'users': 0, 'rmse': None, 'top_n_overlap': None}
+    online_scores = scorer.user_scores_many(user_ids)
+    reference_scores = reference.user_scores_many(user_ids)
+    rmse = float(np.sqrt(np.mean((online_scores - reference_scores) ** 2)))
+    online_top, _ = SVDScorer.top_n_many(online_scores, n)
+    reference_top, _ = SVDScorer.top_n_many(reference_scores, n)
+    overlap = np.mean([len(np.intersect1d(a, b)) / n for a, b in zip(online_top, reference_top)])
+    return {'users': len(user_ids), 'rmse': rmse, 'top_n_overlap': float(overlap)}
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors
+
+from content_index import ContentIndex, ExactContentIndex, candidate_distances
+
+
+def test_content_index_requires_query():
+    with pytest.raises(TypeError):
+        ContentIndex()
+
+
+@pytest.mark.parametrize('params', [
+    {'metric': 'cosine'},
+    {'metric': 'euclidean'},
+    {'metric': 'minkowski', 'p': 2},
+    {'metric': 'minkowski', 'p': 3},
+    {'metric': 'manhattan'},
+    {'metric': 'chebyshev'},
+])
+def test_candidate_distances_match_kneighbors(params):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(200, 6))
+    index = ExactContentIndex(NearestNeighbors(algorithm='brute', **params).fit(data))
+    queries = data[:20]
+
+    expected, neighbours = index.query(queries, 5)
+    distances = candidate_distances(queries, data[neighbours], index.metric, index.metric_params)
+
+    np.testing.assert_allclose(distances, expected, atol=1e-9)
+
+
+def test_candidate_distances_without_candidates():
+    queries = np.ones((3, 4))
+    assert candidate_distances(queries, np.empty((3, 0, 4)), 'minkowski', {'p': 3}).shape == (3, 0)
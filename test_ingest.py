@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest import RatingsIngester
+
+
+@pytest.fixture(params=[False, True], ids=['default', 'compact'])
+def model(make_model, request):
+    model = make_model(compact=request.param)
+    model.wait_for_collaborative()
+    return model
+
+
+def _user_ratings(model, user_id):
+    new_df, user_items, _ = model.collaborative_snapshot()
+    span = user_items.user_slice(user_id)
+    indexed = dict(zip(user_items.item_ids[user_items.indices[span]], user_items.ratings[span].tolist()))
+    rows = new_df[new_df['user_id'] == user_id]
+    return indexed, rows
+
+
+def test_rerated_tracks_replace_the_old_rating(model):
+    user_id = int(model.user_items.user_ids[0])
+    before, rows_before = _user_ratings(model, user_id)
+    rated = list(before)[:2]
+    n_rows = len(model.new_df)
+
+    model.apply_ratings(pd.DataFrame({
+        'user_id': [user_id] * 4,
+        'track_id': [rated[0], 'new-track', rated[1], 'new-track'],
+        'rating': [1.0, 2.0, 3.0, 4.0],
+    }))
+
+    after, rows_after = _user_ratings(model, user_id)
+    assert len(model.new_df) == n_rows + 1
+    assert len(after) == len(rows_after) == len(before) + 1
+    assert after == {**before, rated[0]: 1.0, rated[1]: 3.0, 'new-track': 4.0}
+    assert dict(zip(rows_after['track_id'].astype(str), rows_after['rating'].tolist())) == after
+    assert not rows_after.duplicated('track_id').any()
+
+
+def test_rerating_leaves_earlier_snapshots_alone(model):
+    new_df, user_items, _ = model.collaborative_snapshot()
+    user_id = int(user_items.user_ids[0])
+    ratings = user_items.ratings.copy()
+    column = new_df['rating'].to_numpy().copy()
+    track_id = user_items.item_ids[user_items.rated_items(user_id)[0]]
+
+    model.apply_ratings(pd.DataFrame({'user_id': [user_id], 'track_id': [track_id], 'rating': [0.5]}))
+
+    np.testing.assert_array_equal(user_items.ratings, ratings)
+    np.testing.assert_array_equal(new_df['rating'].to_numpy(), column)
+    assert model.user_items.fingerprint(user_id) != user_items.fingerprint(user_id)
+
+
+class _AppendingModel:
+    # Writes more ratings to the log on every update, so it never runs dry
+    def __init__(self, path, stop):
+        self.path = path
+        self.stop = stop
+        self.batches = []
+
+    def apply_ratings(self, rows, n_epochs=5, fold_in=True):
+        self.batches.append(rows)
+        with open(self.path, 'a') as file:
+            file.write("1,more,3.0\n")
+        self.stop.set()
+        return rows['user_id'].unique().tolist()
+
+
+def test_follow_stops_while_the_log_keeps_growing(tmp_path):
+    path = tmp_path / 'ratings.log'
+    path.write_text("user_id,track_id,rating\n1,a,4.0\n")
+    stop = threading.Event()
+    model = _AppendingModel(str(path), stop)
+
+    offset = RatingsIngester(model).follow(str(path), interval=0.01, stop=stop)
+
+    assert len(model.batches) == 1
+    assert offset == len("user_id,track_id,rating\n1,a,4.0\n")
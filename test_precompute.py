@@ -0,0 +1,17 @@
+import pytest
+
+from precompute import build_collaborative_top_n, load_collaborative_top_n
+
+
+@pytest.mark.parametrize('build_compact', [False, True])
+def test_top_n_table_reused_across_compact_modes(make_model, tmp_path, build_compact):
+    builder = make_model(compact=build_compact)
+    build_collaborative_top_n(builder, str(tmp_path), n=20, workers=1)
+    table = load_collaborative_top_n(str(tmp_path))
+
+    reader = make_model(compact=not build_compact)
+    reader.wait_for_collaborative()
+    _, user_items, _ = reader.collaborative_snapshot()
+
+    users = user_items.user_ids.tolist()
+    assert all(table.row(user, user_items.fingerprint(user)) is not None for user in users)
@@ -0,0 +1,110 @@
+import math
+
+import pytest
+
+from cache import SpotifyCache
+from fakes import FakeSpotifyClient
+from fusion import HybridFusion
+from recommender import Recommender
+from spotify_client import AUDIO_FEATURES_BATCH_SIZE, TRACKS_BATCH_SIZE, fetch_track_data
+
+
+def _ids(n, prefix='track'):
+    return [f"{prefix}{i:05d}" for i in range(n)]
+
+
+class CountingCache(SpotifyCache):
+    # Records every bulk write so tests can check misses go back in one call
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_many_calls = []
+
+    def set_many(self, items):
+        self.set_many_calls.append(dict(items))
+        super().set_many(items)
+
+
+@pytest.fixture(scope='module')
+def model(make_model):
+    return make_model()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CountingCache(cache_file=str(tmp_path / 'cache.db'))
+    yield cache
+    cache.close()
+
+
+def test_fetch_track_data_chunks_each_endpoint():
+    client = FakeSpotifyClient()
+    track_ids = _ids(230)
+
+    found = fetch_track_data(client, track_ids)
+
+    assert set(found) == set(track_ids)
+    assert [len(batch) for batch in client.batches['tracks']] == [50, 50, 50, 50, 30]
+    assert [len(batch) for batch in client.batches['audio_features']] == [100, 100, 30]
+    assert TRACKS_BATCH_SIZE == 50 and AUDIO_FEATURES_BATCH_SIZE == 100
+
+
+def test_fetch_track_data_requests_each_id_once():
+    client = FakeSpotifyClient()
+
+    fetch_track_data(client, ['a', 'b', 'a', 'c', 'b'])
+
+    assert client.batches['tracks'] == [['a', 'b', 'c']]
+    assert client.batches['audio_features'] == [['a', 'b', 'c']]
+
+
+def test_get_track_features_many_fetches_only_misses(model, cache):
+    client = FakeSpotifyClient()
+    recommender = Recommender(model, client, cache)
+    cached = _ids(30, 'cached')
+    cache.set_many(fetch_track_data(FakeSpotifyClient(), cached))
+    cache.set_many_calls.clear()
+    misses = _ids(70, 'missing')
+
+    found = recommender.get_track_features_many(cached + misses)
+
+    assert set(found) == set(cached + misses)
+    fetched = [track_id for batch in client.batches['tracks'] for track_id in batch]
+    assert sorted(fetched) == sorted(misses)
+    assert len(client.batches['tracks']) == math.ceil(len(misses) / TRACKS_BATCH_SIZE)
+    assert len(client.batches['audio_features']) == 1
+    # Misses are written back in one bulk write
+    assert len(cache.set_many_calls) == 1
+    assert set(cache.set_many_calls[0]) == set(misses)
+
+
+def test_get_track_features_many_all_cached_makes_no_calls(model, cache):
+    client = FakeSpotifyClient()
+    recommender = Recommender(model, client, cache)
+    cached = _ids(10, 'cached')
+    cache.set_many(fetch_track_data(FakeSpotifyClient(), cached))
+    cache.set_many_calls.clear()
+
+    assert set(recommender.get_track_features_many(cached)) == set(cached)
+    assert client.calls == 0
+    assert cache.set_many_calls == []
+
+
+def test_hybrid_fetches_fallbacks_in_one_batch(model, cache):
+    client = FakeSpotifyClient()
+    # Rank by collaborative score alone so off-catalog tracks are returned
+    recommender = Recommender(model, client, cache, fusion=HybridFusion(content_weight=0.0))
+    seed = recommender.track_ids[0]
+    pairs = [(user_id, seed) for user_id in range(1, 21)]
+
+    results = recommender.recommend_many(pairs, top_n=10)
+
+    off_catalog = {rec['track_id'] for recs in results for rec in recs
+                   if rec['track_id'] not in recommender.track_index}
+    assert off_catalog
+    # Every fallback in the batch is fetched together, each id once
+    fetched = [track_id for batch in client.batches['tracks'] for track_id in batch]
+    assert sorted(fetched) == sorted(off_catalog)
+    assert len(client.batches['tracks']) == math.ceil(len(off_catalog) / TRACKS_BATCH_SIZE)
+    assert len(client.batches['audio_features']) == math.ceil(len(off_catalog) / AUDIO_FEATURES_BATCH_SIZE)
+    assert len(cache.set_many_calls) == 1
+    assert all(rec['track_name'] != 'Unknown' for recs in results for rec in recs)
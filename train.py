@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import pickle
+import logging
+import itertools
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.neighbors import NearestNeighbors
+
+from artifacts import write_latest
+from spotify_model import FEATURE_COLS
+
+logger = logging.getLogger(__name__)
+
+# Hyperparameter candidates for the SVD search; every combination is tried
+DEFAULT_SVD_GRID = {
+    'n_factors': [50, 100],
+    'n_epochs': [20],
+    'lr_all': [0.005, 0.01],
+    'reg_all': [0.02, 0.1],
+}
+
+
+class StageTimer:
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.times[name] = time.perf_counter() - start
+        logger.info(f"Stage {name} took {self.times[name]:.2f}s")
+
+
+def fit_scaler(catalog_path, chunksize):
+    # Only the feature columns are parsed; statistics accumulate chunk by chunk
+    scaler = StandardScaler()
+    for chunk in pd.read_csv(catalog_path, usecols=FEATURE_COLS, chunksize=chunksize):
+        scaler.partial_fit(chunk[FEATURE_COLS])
+    return scaler
+
+
+def scale_features(catalog_path, scaler, chunksize):
+    chunks = [scaler.transform(chunk[FEATURE_COLS])
+              for chunk in pd.read_csv(catalog_path, usecols=FEATURE_COLS, chunksize=chunksize)]
+    return np.vstack(chunks) if chunks else np.empty((0, len(FEATURE_COLS)))
+
+
+def read_ratings(ratings_path, chunksize):
+    dtypes = {'user_id': np.int32, 'track_id': str, 'rating': np.float32}
+    chunks = list(pd.read_csv(ratings_path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(dtypes))
+
+
+def svd_candidates(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+# Ratings dataset, loaded once per worker process by _init_svd_worker
+_worker = {}
+
+
+def _init_svd_worker(ratings, rating_scale, folds, seed):
+    from surprise import Dataset, Reader
+    reader = Reader(rating_scale=rating_scale)
+    _worker['data'] = Dataset.load_from_df(ratings[['user_id', 'track_id', 'rating']], reader)
+    _worker['folds'] = folds
+    _worker['seed'] = seed
+
+
+def _evaluate_svd(params):
+    # Mean k-fold RMSE of one candidate; folds are identical across candidates
+    from surprise import SVD
+    from surprise.model_selection import KFold, cross_validate
+    start = time.perf_counter()
+    folds = KFold(n_splits=_worker['folds'], random_state=_worker['seed'])
+    result = cross_validate(SVD(random_state=_worker['seed'], **params), _worker['data'],
+                            measures=['rmse'], cv=folds, n_jobs=1)
+    return {'params': params, 'rmse': float(np.mean(result['test_rmse'])),
+            'seconds': time.perf_counter() - start}
+
+
+def search_svd(ratings, rating_scale, grid, folds=3, workers=None, seed=0):
+    candidates = svd_candidates(grid)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_svd_worker,
+                             initargs=(ratings, rating_scale, folds, seed)) as pool:
+        results = list(pool.map(_evaluate_svd, candidates))
+    for result in results:
+        logger.info(f"SVD {result['params']}: RMSE {result['rmse']:.4f} ({result['seconds']:.1f}s)")
+    return min(results, key=lambda result: result['rmse']), results
+
+
+def fit_svd(ratings, rating_scale, params, seed=0):
+    from surprise import SVD, Dataset, Reader
+    data = Dataset.load_from_df(ratings[['user_id', 'track_id', 'rating']], Reader(rating_scale=rating_scale))
+    return SVD(random_state=seed, **params).fit(data.build_full_trainset())
+
+
+def train(data_dir='data', out_root='models', version=None, chunksize=50000, metric='cosine',
+          n_neighbors=10, svd_grid=None, folds=3, workers=None, rating_scale=None, seed=0):
+    """Fit the content and collaborative models and write a versioned model directory.
+
+    The directory holds nn_model.pkl and svd_model.pkl, which SpotifyModel loads
+    with model_dir=out_root, and training.json with the search results
+    and per-stage wall times.
+    """
+    version = version or datetime.now().strftime('%Y%m%dT%H%M%S')
+    out_dir = os.path.join(out_root, version)
+    os.makedirs(out_dir, exist_ok=False)
+    timer = StageTimer()
+    catalog_path = os.path.join(data_dir, 'data_cleaned.csv')
+    ratings_path = os.path.join(data_dir, 'user_matrix.csv')
+
+    with timer.stage('scaler'):
+        scaler = fit_scaler(catalog_path, chunksize)
+    with timer.stage('features'):
+        features = scale_features(catalog_path, scaler, chunksize)
+    with timer.stage('nn_model'):
+        nn_model = NearestNeighbors(n_neighbors=n_neighbors, metric=metric, algorithm='brute').fit(features)
+
+    with timer.stage('ratings'):
+        ratings = read_ratings(ratings_path, chunksize)
+    rating_scale = tuple(rating_scale or (float(ratings['rating'].min()), float(ratings['rating'].max())))
+    with timer.stage('svd_search'):
+        best, results = search_svd(ratings, rating_scale, svd_grid or DEFAULT_SVD_GRID,
+                                   folds=folds, workers=workers, seed=seed)
+    with timer.stage('svd_fit'):
+        svd = fit_svd(ratings, rating_scale, best['params'], seed=seed)
+
+    with timer.stage('write'):
+        for name, model in (('nn_model.pkl', nn_model), ('svd_model.pkl', svd)):
+            with open(os.path.join(out_dir, name), 'wb') as file:
+                pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+    report = {
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'tracks': len(features),
+        'ratings': len(ratings),
+        'rating_scale': list(rating_scale),
+        'content_index': {'metric': metric, 'n_neighbors': n_neighbors},
+        'svd_best': best,
+        'svd_candidates': results,
+        'stage_seconds': timer.times,
+    }
+    with open(os.path.join(out_dir, 'training.json'), 'w') as file:
+        json.dump(report, file, indent=2)
+    write_latest(out_root, version)
+    logger.info(f"Wrote trained models {version} to {out_dir}")
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train nn_model.pkl and svd_model.pkl")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--out', default='models')
+    parser.add_argument('--version', default=None)
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--metric', default='cosine')
+    parser.add_argument('--n-neighbors', type=int, default=10)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--grid', default=None, help="JSON object of SVD parameter lists")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = train(data_dir=args.data_dir, out_root=args.out, version=args.version,
+                   chunksize=args.chunksize, metric=args.metric, n_neighbors=args.n_neighbors,
+                   svd_grid=json.loads(args.grid) if args.grid else None, folds=args.folds,
+                   workers=args.workers, seed=args.seed)
+    print(f"{'stage':<14}{'seconds':>10}")
+    for stage, seconds in report['stage_seconds'].items():
+        print(f"{stage:<14}{seconds:>10.2f}")
+    print(f"{'total':<14}{sum(report['stage_seconds'].values()):>10.2f}")
+    print(f"best SVD {report['svd_best']['params']} RMSE {report['svd_best']['rmse']:.4f}")
@@ -0,0 +1,149 @@
+import copy
+import hashlib
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UserItemIndex:
+    """CSR user x item layout of the user matrix.
+
+    Items are numbered in order of first appearance in ``new_df`` (the same
+    order as ``new_df['track_id'].unique()``), users likewise.
+    """
+
+    def __init__(self, new_df):
+        user_codes, user_ids = pd.factorize(new_df['user_id'])
+        item_codes, item_ids = pd.factorize(new_df['track_id'])
+
+        self.user_ids = np.asarray(user_ids)
+        self.item_ids = np.asarray(item_ids, dtype=object)
+        self.user_positions = {user: pos for pos, user in enumerate(self.user_ids.tolist())}
+        self.item_positions = {item: pos for pos, item in enumerate(self.item_ids)}
+
+        # Group rows by user; a stable sort keeps each user's rows in file order
+        order = np.argsort(user_codes, kind='stable')
+        counts = np.bincount(user_codes, minlength=len(self.user_ids))
+        self.indptr = np.zeros(len(self.user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+        self.indices = item_codes[order].astype(np.int32)
+        self.ratings = new_df['rating'].to_numpy()[order]
+        self.rows = order
+
+    @classmethod
+    def from_arrays(cls, user_ids, item_ids, indptr, indices, ratings, rows):
+        # Index over existing CSR arrays, such as read-only shared memory views;
+        # only the id arrays and position dicts are built per process
+        index = cls.__new__(cls)
+        user_ids = np.asarray(user_ids)
+        index.user_ids = user_ids.astype(object) if user_ids.dtype.kind == 'U' else user_ids
+        index.item_ids = np.asarray(item_ids).astype(object)
+        index.user_positions = {user: pos for pos, user in enumerate(index.user_ids.tolist())}
+        index.item_positions = {item: pos for pos, item in enumerate(index.item_ids)}
+        index.indptr = indptr
+        index.indices = indices
+        index.ratings = ratings
+        index.rows = rows
+        return index
+
+    def appended(self, rows, first_row):
+        # Index of new_df with rows appended from position first_row on; the
+        # same as rebuilding from the longer frame, without re-reading it
+        index = copy.copy(self)
+        user_ids = rows['user_id'].tolist()
+        item_ids = rows['track_id'].tolist()
+        new_users = [user for user in dict.fromkeys(user_ids) if user not in self.user_positions]
+        new_items = [item for item in dict.fromkeys(item_ids) if item not in self.item_positions]
+        if new_users:
+            index.user_ids = np.concatenate([self.user_ids, np.asarray(new_users, dtype=self.user_ids.dtype)])
+            index.user_positions = {**self.user_positions,
+                                    **{user: len(self.user_ids) + k for k, user in enumerate(new_users)}}
+        if new_items:
+            index.item_ids = np.concatenate([self.item_ids, np.asarray(new_items, dtype=object)])
+            index.item_positions = {**self.item_positions,
+                                    **{item: len(self.item_ids) + k for k, item in enumerate(new_items)}}
+
+        user_codes = np.array([index.user_positions[user] for user in user_ids], dtype=np.int64)
+        item_codes = np.array([index.item_positions[item] for item in item_ids], dtype=np.int32)
+        # Each new entry goes to the end of its user's run
+        order = np.argsort(user_codes, kind='stable')
+        n_users = len(self.user_ids)
+        positions = np.where(user_codes[order] < n_users,
+                             self.indptr[np.minimum(user_codes[order], n_users - 1) + 1],
+                             len(self.indices))
+        index.indices = np.insert(self.indices, positions, item_codes[order])
+        index.ratings = np.insert(self.ratings, positions, rows['rating'].to_numpy()[order])
+        index.rows = np.insert(self.rows, positions, first_row + order)
+        counts = np.bincount(user_codes, minlength=len(index.user_ids))
+        counts[:n_users] += np.diff(self.indptr)
+        index.indptr = np.zeros(len(index.user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=index.indptr[1:])
+        return index
+
+    def entries(self, user_ids, item_ids):
+        # Positions in indices/ratings of each (user, item) rating, -1 where
+        # the user hasn't rated the item; the last one if rated twice
+        user_codes = np.array([self.user_positions.get(user, -1) for user in user_ids], dtype=np.int64)
+        item_codes = np.array([self.item_positions.get(item, -1) for item in item_ids], dtype=np.int64)
+        found = np.full(len(user_codes), -1, dtype=np.int64)
+        known = np.flatnonzero((user_codes >= 0) & (item_codes >= 0))
+        if not len(known):
+            return found
+        # Key every rating of the users involved by (user, item) and look the
+        # requested pairs up in the sorted keys
+        users = np.unique(user_codes[known])
+        starts, lengths = self.indptr[users], np.diff(self.indptr)[users]
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        keys = np.repeat(users, lengths) * self.n_items + self.indices[positions]
+        order = np.argsort(keys, kind='stable')
+        wanted = user_codes[known] * self.n_items + item_codes[known]
+        at = np.searchsorted(keys[order], wanted, side='right') - 1
+        hit = (at >= 0) & (keys[order][np.maximum(at, 0)] == wanted)
+        found[known[hit]] = positions[order[at[hit]]]
+        return found
+
+    def with_ratings(self, entries, ratings):
+        # Index with the ratings at the given entries() positions replaced
+        index = copy.copy(self)
+        index.ratings = self.ratings.copy()
+        index.ratings[entries] = ratings
+        return index
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    def user_slice(self, user_id):
+        pos = self.user_positions.get(user_id)
+        if pos is None:
+            return slice(0, 0)
+        return slice(self.indptr[pos], self.indptr[pos + 1])
+
+    def rated_items(self, user_id):
+        return self.indices[self.user_slice(user_id)]
+
+    def user_rows(self, user_id):
+        # Row positions of the user's ratings in new_df
+        return self.rows[self.user_slice(user_id)]
+
+    def fingerprint(self, user_id):
+        # Changes whenever the user's rated items or ratings change. Ratings
+        # are hashed as float32, the compact dtype, so default and compact
+        # models agree on fingerprints built by either
+        span = self.user_slice(user_id)
+        digest = hashlib.blake2b(self.indices[span].tobytes(), digest_size=8)
+        digest.update(np.asarray(self.ratings[span], dtype=np.float32).tobytes())
+        return int.from_bytes(digest.digest(), 'little')
+
+    def exclusion_mask(self, user_id):
+        mask = np.zeros(self.n_items, dtype=bool)
+        mask[self.rated_items(user_id)] = True
+        return mask
+
+    def exclusion_masks(self, user_ids):
+        mask = np.zeros((len(user_ids), self.n_items), dtype=bool)
+        for row, user_id in enumerate(user_ids):
+            mask[row, self.rated_items(user_id)] = True
+        return mask